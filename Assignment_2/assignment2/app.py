@@ -38,10 +38,21 @@ import pyrr
 import time
 
 from enum import Enum
-from mesh_viewer import MeshViewer
+from mesh_viewer import MeshViewer, NORMAL_WEIGHTINGS
+from vertex_attributes import VERTEX_ATTRIBUTES
+from mesh_cache import MeshCache
+from session import MeshSession
+from headless import EGLContext
+from lod import LOD_RATIOS, select_lod
 import tkinter as tk
 from tkinter import filedialog
 
+UNIFORM_NAMES = ("model", "view", "projection", "shadingMode", "useValenceColor", "enableLighting",
+                 "faceColor", "colorScale", "scalarRange", "colormapIndex", "wireframeOverlay",
+                 "backgroundColor", "viewportSize", "compactVertices", "positionOffset", "positionScale",
+                 "scalarDecode")
+LIGHTING_BINDING = 0
+
 class ControlState(Enum):
     TRANSLATE = 0
     ROTATE = 1
@@ -74,40 +85,59 @@ class DrawingMode(Enum):
 
 class ValenceApp:
     def __init__(self, width: int, height: int, 
-                 vertex_shader_path: str, fragment_shader_path: str):
-        if not glfw.init():
-            raise RuntimeError("Failed to initialize GLFW")
+                 vertex_shader_path: str, fragment_shader_path: str, geometry_shader_path: str,
+                 mesh_cache: MeshCache = None, mesh_path: str = None, headless: bool = False,
+                 lod_levels: int = len(LOD_RATIOS), compact_vertices: bool = False, extra_mesh_paths=()):
         self._width = width
         self._height = height
-        
-        glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
-        glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
-        glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
 
-        self.window = glfw.create_window(width, height, "Valence Viewer", None, None)
-        if not self.window:
-            glfw.terminate()
-            raise RuntimeError("Failed to create GLFW window")
+        self.window = self._egl_context = None
+        if headless:
+            # No window system at all: an EGL context, and frames go to an
+            # offscreen framebuffer
+            self._egl_context = EGLContext(width, height)
+        else:
+            if not glfw.init():
+                raise RuntimeError("Failed to initialize GLFW")
+            glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
+            glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
+            glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+
+            self.window = glfw.create_window(width, height, "Valence Viewer", None, None)
+            if not self.window:
+                glfw.terminate()
+                raise RuntimeError("Failed to create GLFW window")
 
-        glfw.make_context_current(self.window)
+            glfw.make_context_current(self.window)
+
+        self._framebuffer = None
+        if headless:
+            self._create_offscreen_framebuffer(width, height)
 
         self._control_state = ControlState.IDLE
         self._drawing_mode = DrawingMode.SOLID_SMOOTH
         self._cursor_pos = np.array([0., 0.], dtype=np.float32)
-        self._rotate_value = np.array([0., 0.], dtype=np.float32)
+        self._rotate_value = np.array([0., 0., 0.], dtype=np.float32)
         self._translate_value = np.array([0., -0.1], dtype=np.float32)
         self._scale_value = 1.
+        self._lod_enabled = True
+        self._culling_enabled = True
 
         self._shader_program = self._create_shader(
             vertex_shader_path,
-            fragment_shader_path
+            fragment_shader_path,
+            geometry_shader_path
         )
 
-        self.enable_lighting_loc = glGetUniformLocation(self._shader_program, "enableLighting")
-        self.face_color_loc = glGetUniformLocation(self._shader_program, "faceColor")
+        self._init_uniform_locations()
 
-        mesh_path = self._get_map_path()
-        self._mesh_data = MeshViewer(mesh_path)
+        if mesh_path is None:
+            mesh_path = self._get_map_path()
+        # The first mesh is loaded right away, further ones stream in while rendering
+        self._session = MeshSession(cache=mesh_cache, lod_levels=lod_levels, compact=compact_vertices)
+        self._session.load_now(mesh_path)
+        for path in extra_mesh_paths:
+            self._session.load(path)
         
         self._color_scale = 1.0
         # self._colormaps = self._mesh_data._colormaps
@@ -119,11 +149,35 @@ class ValenceApp:
         glDepthFunc(GL_LESS)
         glClearColor(0.0, 0.0, 0.0, 1.0)
 
-        glfw.set_mouse_button_callback(self.window, self._mouse_button_callback)
-        glfw.set_cursor_pos_callback(self.window, self._cursor_pos_callback)
-        glfw.set_scroll_callback(self.window, self._scroll_callback)
-        glfw.set_key_callback(self.window, self._keyboard_callback)
+        if self.window is not None:
+            glfw.set_mouse_button_callback(self.window, self._mouse_button_callback)
+            glfw.set_cursor_pos_callback(self.window, self._cursor_pos_callback)
+            glfw.set_scroll_callback(self.window, self._scroll_callback)
+            glfw.set_key_callback(self.window, self._keyboard_callback)
+            glfw.set_framebuffer_size_callback(self.window, self._framebuffer_size_callback)
     
+    def _create_offscreen_framebuffer(self, width: int, height: int):
+        self._framebuffer = glGenFramebuffers(1)
+        glBindFramebuffer(GL_FRAMEBUFFER, self._framebuffer)
+        self._renderbuffers = glGenRenderbuffers(2)
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self._renderbuffers[0])
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_RGBA8, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_RENDERBUFFER, self._renderbuffers[0])
+
+        glBindRenderbuffer(GL_RENDERBUFFER, self._renderbuffers[1])
+        glRenderbufferStorage(GL_RENDERBUFFER, GL_DEPTH_COMPONENT24, width, height)
+        glFramebufferRenderbuffer(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_RENDERBUFFER, self._renderbuffers[1])
+
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("Offscreen framebuffer is incomplete")
+        glViewport(0, 0, width, height)
+
+    @property
+    def _mesh_data(self) -> MeshViewer:
+        """The first mesh of the session, which the camera and benchmarks refer to."""
+        return self._session.objects[0]
+
     def _get_map_path(self):
         """
         Opens a file dialog for the user to select the height map file.
@@ -139,17 +193,20 @@ class ValenceApp:
         )
         return file_path
     
-    def _create_shader(self, vertex_path: str, fragment_path: str) -> int:
+    def _create_shader(self, vertex_path: str, fragment_path: str, geometry_path: str) -> int:
         with open(vertex_path, 'r') as f:
             vertex_src = f.read()
         with open(fragment_path, 'r') as f:
             fragment_src = f.read()
+        with open(geometry_path, 'r') as f:
+            geometry_src = f.read()
 
         local_vao = glGenVertexArrays(1)
         glBindVertexArray(local_vao)
 
         program = compileProgram(
             compileShader(vertex_src, GL_VERTEX_SHADER),
+            compileShader(geometry_src, GL_GEOMETRY_SHADER),
             compileShader(fragment_src, GL_FRAGMENT_SHADER)
         )
 
@@ -159,179 +216,241 @@ class ValenceApp:
         return program
 
     def _init_projection_transform(self, width: int, height: int):
+        self._update_projection(width, height)
+
+        self._model = np.eye(4, dtype=np.float32)
+        glUniformMatrix4fv(self._uniforms["model"], 1, GL_FALSE, self._model)
+
+        # The camera is fixed, so the view matrix is set once as well
+        self._view = np.eye(4, dtype=np.float32)
+        self._view[2, 3] = -0.5
+        glUniformMatrix4fv(self._uniforms["view"], 1, GL_FALSE, self._view)
+
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        self._update_viewport(int(viewport[2]), int(viewport[3]))
+
+    def _update_projection(self, width: int, height: int):
         aspect = width / float(height)
         self._projection = pyrr.matrix44.create_perspective_projection(
             fovy=30.0, aspect=aspect, near=0.01, far=10.0, dtype=np.float32
         )
         glUseProgram(self._shader_program)
-        proj_loc = glGetUniformLocation(self._shader_program, "projection")
-        glUniformMatrix4fv(proj_loc, 1, GL_FALSE, self._projection)
+        glUniformMatrix4fv(self._uniforms["projection"], 1, GL_FALSE, self._projection)
 
-        self._model = np.eye(4, dtype=np.float32)
-        model_loc = glGetUniformLocation(self._shader_program, "model")
-        glUniformMatrix4fv(model_loc, 1, GL_FALSE, self._model)
+    def _update_viewport(self, width: int, height: int):
+        # The wireframe overlay measures edge distances in framebuffer pixels
+        # and blends them into the background, so both follow the framebuffer
+        self._viewport_height = height
+        glUseProgram(self._shader_program)
+        glUniform2f(self._uniforms["viewportSize"], float(width), float(height))
+        glUniform4f(self._uniforms["backgroundColor"], 0.0, 0.0, 0.0, 1.0)
 
     def run(self):
+        if self.window is None:
+            raise RuntimeError("A headless app has no window to run; call _update_and_draw directly")
         while not glfw.window_should_close(self.window):
+            self._session.poll()
             self._update_and_draw()
             glfw.swap_buffers(self.window)
             glfw.poll_events()
 
-        self._mesh_data.destroy()
+        self.destroy()
+
+    def destroy(self):
+        self._session.destroy()
+        glDeleteBuffers(1, [self._lighting_ubo])
+        if self._framebuffer is not None:
+            glDeleteFramebuffers(1, [self._framebuffer])
+            glDeleteRenderbuffers(2, self._renderbuffers)
         glDeleteProgram(self._shader_program)
-        glfw.terminate()
+        if self._egl_context is not None:
+            self._egl_context.destroy()
+        else:
+            glfw.terminate()
+
+    def load_mesh(self, mesh_path: str):
+        """Replace all displayed meshes by `mesh_path`."""
+        self._session.clear()
+        self._session.load_now(mesh_path)
 
-    def measure_fps(self):
-        frames = 90
+    def add_mesh(self, mesh_path: str, transform: NDArray = None):
+        """
+        Load another mesh in the background next to the displayed ones, or at
+        the (4, 4) `transform` in object space of the first mesh.
+        """
+        self._session.load(mesh_path, transform)
+
+    def measure_fps(self, frames: int = 90, timer=None):
+        """
+        Spin the model one full turn around each of the x, y and z axes and
+        return the average frames per second. If given, `timer` is called with
+        begin() and end() around every frame (see benchmark.FrameTimer).
+        """
         angle = 360.0 / frames
-        axis_list = [
-            np.array([1.0, 0.0, 0.0]),
-            np.array([0.0, 1.0, 0.0]),
-            np.array([0.0, 0.0, 1.0])
-        ]
+        rotate_value = self._rotate_value.copy()
 
         start_time = time.time()
-        for axis in axis_list:
+        for axis in range(3):
             for _ in range(frames):
-                if np.array_equal(axis, [1.0, 0.0, 0.0]):
-                    self._rotate_value[1] += angle
-                elif np.array_equal(axis, [0.0, 1.0, 0.0]):
-                    self._rotate_value[0] += angle
-                elif np.array_equal(axis, [0.0, 0.0, 1.0]): 
-                    pass
+                # _rotate_value holds the rotations about (y, x, z)
+                self._rotate_value[(1, 0, 2)[axis]] += angle
+                self._update_model_transform()
 
+                if timer is not None:
+                    timer.begin()
                 self._update_and_draw()
+                if timer is not None:
+                    timer.end()
+        glFinish()
 
         elapsed_time = time.time() - start_time
         total_frames = 3 * frames
         fps = total_frames / elapsed_time
-        self._rotate_value = np.array([0.0, 0.0], dtype=np.float32)
+        self._rotate_value = rotate_value
+        self._update_model_transform()
 
         return fps
 
     def _update_and_draw(self):
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        glUseProgram(self._shader_program)
+        uniforms = self._uniforms
+
+        if self._lighting_dirty:
+            self._upload_lighting()
+
+        # Update the color scale uniform
+        glUniform1f(uniforms["colorScale"], self._color_scale)
+
+        # Hidden line and valence modes draw the edges in the same pass as the
+        # faces (see shaders/wireframe.geom)
+        overlay = self._drawing_mode in (DrawingMode.HIDDEN_LINE, DrawingMode.VALENCE)
+        glUniform1i(uniforms["wireframeOverlay"], int(overlay))
 
         if self._drawing_mode == DrawingMode.WIREFRAME:
             glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-            glUniform1i(self.enable_lighting_loc, 0)
-            glUniform4f(self.face_color_loc, 1.0, 1.0, 1.0, 1.0)
+            glUniform1i(uniforms["enableLighting"], 0)
+            glUniform4f(uniforms["faceColor"], 1.0, 1.0, 1.0, 1.0)
             glDisable(GL_DEPTH_TEST)
-            self._mesh_data.draw()
+            self._draw_meshes()
             glEnable(GL_DEPTH_TEST)
         elif self._drawing_mode == DrawingMode.HIDDEN_LINE:
             glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-            glUniform1i(self.enable_lighting_loc, 0)
-            glUniform4f(self.face_color_loc, 1.0, 1.0, 1.0, 1.0)
+            glUniform1i(uniforms["enableLighting"], 0)
+            glUniform4f(uniforms["faceColor"], 1.0, 1.0, 1.0, 1.0)
         else:
-            glUniform1i(self.enable_lighting_loc, 1)
+            glUniform1i(uniforms["enableLighting"], 1)
             glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
 
-        glUseProgram(self._shader_program)
-        # Update the color scale uniform
-        color_scale_loc = glGetUniformLocation(self._shader_program, "colorScale")
-        glUniform1f(color_scale_loc, self._color_scale)
-        
-        view_matrix = np.eye(4, dtype=np.float32)
-        view_matrix[2, 3] = -0.5
-
-        view_loc = glGetUniformLocation(self._shader_program, "view")
-        glUniformMatrix4fv(view_loc, 1, GL_FALSE, view_matrix)
-
-        light_positions = [
-            np.array([0.1, 0.1, -0.02], dtype=np.float32),
-            np.array([-0.1, 0.1, -0.02], dtype=np.float32),
-            np.array([0.0, 0.0, 0.1], dtype=np.float32)
-        ]
-
-        light_colors = [
-            (0.05, 0.05, 0.8),
-            (0.6, 0.05, 0.05),
-            (1.0, 1.0, 1.0)
-        ]
-
-        for i in range(3):
-            pos_loc = glGetUniformLocation(self._shader_program, f"lights[{i}].position")
-            ambient_loc = glGetUniformLocation(self._shader_program, f"lights[{i}].ambient")
-            diffuse_loc = glGetUniformLocation(self._shader_program, f"lights[{i}].diffuse")
-            specular_loc = glGetUniformLocation(self._shader_program, f"lights[{i}].specular")
-
-            glUniform3fv(pos_loc, 1, light_positions[i])
-            glUniform3f(ambient_loc, light_colors[i][0]*0.1, light_colors[i][1]*0.1, light_colors[i][2]*0.1)
-            glUniform3f(diffuse_loc, light_colors[i][0]*0.8, light_colors[i][1]*0.8, light_colors[i][2]*0.8)
-            glUniform3f(specular_loc, light_colors[i][0], light_colors[i][1], light_colors[i][2])
-
-        material_ambient_loc = glGetUniformLocation(self._shader_program, "material.ambient")
-        material_diffuse_loc = glGetUniformLocation(self._shader_program, "material.diffuse")
-        material_specular_loc = glGetUniformLocation(self._shader_program, "material.specular")
-        material_shininess_loc = glGetUniformLocation(self._shader_program, "material.shininess")
-
-        glUniform3f(material_ambient_loc, 0.2, 0.2, 0.2)
-        glUniform3f(material_diffuse_loc, 0.4, 0.4, 0.4)
-        glUniform3f(material_specular_loc, 0.8, 0.8, 0.8)
-        glUniform1f(material_shininess_loc, 128.0)
-
-        shading_mode_loc = glGetUniformLocation(self._shader_program, "shadingMode")
-
         if self._drawing_mode == DrawingMode.SOLID_FLAT:
-            glUniform1i(shading_mode_loc, 0)
+            glUniform1i(uniforms["shadingMode"], 0)
         else:
-            glUniform1i(shading_mode_loc, 1)
+            glUniform1i(uniforms["shadingMode"], 1)
 
         if self._drawing_mode == DrawingMode.HIDDEN_LINE:
-            glColorMask(GL_FALSE, GL_FALSE, GL_FALSE, GL_FALSE)
-            glDepthRange(0.01, 1.0)
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-            self._mesh_data.draw()
-
-            glColorMask(GL_TRUE, GL_TRUE, GL_TRUE, GL_TRUE)
-            glDepthRange(0.0, 1.0)
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-            glDepthFunc(GL_LEQUAL)
-            self._mesh_data.draw()
-
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-            glDepthFunc(GL_LESS)
+            self._draw_meshes()
 
         elif self._drawing_mode == DrawingMode.SOLID_FLAT:
-            shading_mode_loc = glGetUniformLocation(self._shader_program, "shadingMode")
-            color_mode_loc = glGetUniformLocation(self._shader_program, "useValenceColor")
-            glUniform1i(color_mode_loc, 1)
-            glUniform1i(shading_mode_loc, 0)
+            glUniform1i(uniforms["useValenceColor"], 1)
+            glUniform1i(uniforms["shadingMode"], 0)
             glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-            self._mesh_data.draw()
+            self._draw_meshes()
 
         elif self._drawing_mode == DrawingMode.SOLID_SMOOTH:
-            shading_mode_loc = glGetUniformLocation(self._shader_program, "shadingMode")
-            color_mode_loc = glGetUniformLocation(self._shader_program, "useValenceColor")
-            glUniform1i(color_mode_loc, 1)
-            glUniform1i(shading_mode_loc, 1)
+            glUniform1i(uniforms["useValenceColor"], 1)
+            glUniform1i(uniforms["shadingMode"], 1)
             glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-            self._mesh_data.draw()
+            self._draw_meshes()
 
         elif self._drawing_mode == DrawingMode.VALENCE:
-            glDepthRange(0.01, 1.0)
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-
-            color_mode_loc = glGetUniformLocation(self._shader_program, "useValenceColor")
-            glUniform1i(color_mode_loc, 1)
-
-            self._mesh_data.draw()
-
-            glDepthRange(0.0, 1.0)
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-            glDepthFunc(GL_LEQUAL)
-
-            glUniform1i(color_mode_loc, 0)
-
-            self._mesh_data.draw()
-
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-            glDepthFunc(GL_LESS)
-
-            glDepthRange(0.01, 1.0)
+            glUniform1i(uniforms["useValenceColor"], 1)
             glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-
+            self._draw_meshes()
+
+    def _draw_meshes(self):
+        for mesh in self._session.objects:
+            # Colormap lookup: the scalars are already on the GPU, only the
+            # range and the colormap row are set per mesh
+            self._set_uniform("scalarRange", glUniform2f, *mesh.scalar_range)
+            self._set_uniform("colormapIndex", glUniform1i, mesh._colormap_index)
+
+            # Decoding of the (optionally) quantized vertex attributes
+            self._set_uniform("compactVertices", glUniform1i, int(mesh.compact))
+            self._set_uniform("positionOffset", glUniform3f, *mesh.position_decode[0])
+            self._set_uniform("positionScale", glUniform3f, *mesh.position_decode[1])
+            self._set_uniform("scalarDecode", glUniform2f, *mesh.scalar_decode)
+
+            if self._culling_enabled:
+                # Back faces are hidden by the depth test except in wireframe mode
+                mesh.draw(self._select_lod(mesh), self._model @ self._view @ self._projection,
+                          backface=self._drawing_mode != DrawingMode.WIREFRAME)
+            else:
+                mesh.draw(self._select_lod(mesh))
+
+    def _set_uniform(self, name: str, setter, *value):
+        """Call setter (e.g. glUniform2f) for uniform `name` only if `value` differs from the last one sent."""
+        value = tuple(v.item() if isinstance(v, np.generic) else v for v in value)
+        if self._uniform_values.get(name) != value:
+            setter(self._uniforms[name], *value)
+            self._uniform_values[name] = value
+
+    def _select_lod(self, mesh: MeshViewer) -> int:
+        """Level of detail for the largest instance of `mesh` on screen."""
+        if not self._lod_enabled or len(mesh.lod_indices) == 1:
+            return 0
+        # Matrices are uploaded untransposed, so numpy applies them to row vectors
+        center = np.append(mesh.bounding_center, 1.0).astype(np.float32)
+        clip = center @ mesh.instances @ self._model @ self._view @ self._projection
+        if np.any(clip[:, 3] <= 1e-6):
+            return 0
+        scale = np.linalg.norm(mesh.instances[:, :3, :3], axis=2).max(axis=1)
+        radius = np.max(mesh.bounding_radius * scale * self._scale_value * self._projection[1, 1] / clip[:, 3])
+        return select_lod([len(l) // 3 for l in mesh.lod_indices], radius * self._viewport_height / 2)
+
+    def _init_uniform_locations(self):
+        # Resolve every uniform once after linking instead of every frame
+        self._uniforms = {name: glGetUniformLocation(self._shader_program, name) for name in UNIFORM_NAMES}
+        # Values last sent through _set_uniform, which the program still holds
+        self._uniform_values = {}
+
+        # Lights and material live in a std140 uniform block that is only
+        # re-uploaded when self._lights or self._material change
+        block_index = glGetUniformBlockIndex(self._shader_program, "Lighting")
+        glUniformBlockBinding(self._shader_program, block_index, LIGHTING_BINDING)
+        self._lighting_ubo = glGenBuffers(1)
+        glBindBufferBase(GL_UNIFORM_BUFFER, LIGHTING_BINDING, self._lighting_ubo)
+
+        self._lights = [
+            # position, color
+            ((0.1, 0.1, -0.02), (0.05, 0.05, 0.8)),
+            ((-0.1, 0.1, -0.02), (0.6, 0.05, 0.05)),
+            ((0.0, 0.0, 0.1), (1.0, 1.0, 1.0)),
+        ]
+        self._material = {'ambient': (0.2, 0.2, 0.2), 'diffuse': (0.4, 0.4, 0.4),
+                          'specular': (0.8, 0.8, 0.8), 'shininess': 128.0}
+        self._lighting_dirty = True
+
+    def _upload_lighting(self):
+        # std140: every vec3 takes 16 bytes, a Light is four of them and the
+        # shininess float fills the padding after material.specular
+        data = np.zeros(4 * 4 * len(self._lights) + 4 * 3, dtype=np.float32)
+        for i, (position, color) in enumerate(self._lights):
+            color = np.array(color, dtype=np.float32)
+            light = data[16 * i:16 * (i + 1)].reshape(4, 4)
+            light[0, :3] = position
+            light[1, :3] = color * 0.1
+            light[2, :3] = color * 0.8
+            light[3, :3] = color
+        material = data[16 * len(self._lights):].reshape(3, 4)
+        material[0, :3] = self._material['ambient']
+        material[1, :3] = self._material['diffuse']
+        material[2, :3] = self._material['specular']
+        material[2, 3] = self._material['shininess']
+
+        glBindBuffer(GL_UNIFORM_BUFFER, self._lighting_ubo)
+        glBufferData(GL_UNIFORM_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self._lighting_dirty = False
 
     def _mouse_button_callback(self, window, button, action, mods):
         if action == glfw.PRESS:
@@ -363,7 +482,7 @@ class ValenceApp:
             cursor_delta[1] *= -1
             self._translate_value += cursor_delta * 0.001
         elif self._control_state == ControlState.ROTATE:
-            self._rotate_value += -cursor_delta * 0.5
+            self._rotate_value[:2] += -cursor_delta * 0.5
         elif self._control_state == ControlState.SCALE:
             pass
         elif self._control_state == ControlState.IDLE:
@@ -372,6 +491,13 @@ class ValenceApp:
         
         self._update_model_transform()
 
+    def _framebuffer_size_callback(self, window, width, height):
+        if width == 0 or height == 0:
+            return  # Minimized
+        glViewport(0, 0, width, height)
+        self._update_projection(width, height)
+        self._update_viewport(width, height)
+
     def _scroll_callback(self, window, xoffset, yoffset):
         self._scale_value *= (1 - 0.01 * yoffset)
         self._update_model_transform()
@@ -405,10 +531,35 @@ class ValenceApp:
                 self._color_scale = max(self._color_scale - 0.1, 0.1)  # Decrease color intensity
                 self._update_and_draw()
                 print(f"Color Scale: {self._color_scale}")
+            if key == glfw.KEY_W:
+                weightings = NORMAL_WEIGHTINGS
+                weighting = weightings[(weightings.index(self._mesh_data.normal_weighting) + 1) % len(weightings)]
+                for mesh in self._session.objects:
+                    mesh.compute_normals(weighting)
+                    mesh._setup_gl_buffers()
+                print(f"Normal weighting: {weighting}")
+            if key == glfw.KEY_A:
+                names = list(VERTEX_ATTRIBUTES)
+                name = names[(names.index(self._mesh_data.attribute) + 1) % len(names)]
+                for mesh in self._session.objects:
+                    mesh.set_attribute(name)
+                print(f"Vertex attribute: {name}")
+                self._update_and_draw()
+            if key == glfw.KEY_L:
+                self._lod_enabled = not self._lod_enabled
+                print(f"Level of detail: {'on' if self._lod_enabled else 'off'}")
+            if key == glfw.KEY_C:
+                self._culling_enabled = not self._culling_enabled
+                print(f"Cluster culling: {'on' if self._culling_enabled else 'off'}")
+            if key == glfw.KEY_O:
+                mesh_path = self._get_map_path()
+                if mesh_path:
+                    self.add_mesh(mesh_path)
+                    print(f"Loading {mesh_path}")
             if key == glfw.KEY_X:
-                self._mesh_data._colormap_index = (self._mesh_data._colormap_index + 1) % len(self._mesh_data._colormaps)
-                self._mesh_data.set_colormap(self._mesh_data._colormap_index)
-                self._mesh_data._setup_gl_buffers()
+                colormap_index = (self._mesh_data._colormap_index + 1) % len(self._mesh_data._colormaps)
+                for mesh in self._session.objects:
+                    mesh.set_colormap(colormap_index)
                 self._update_and_draw()
                 print(f"Switched to colormap: {self._mesh_data._colormaps[self._mesh_data._colormap_index]}")
             
@@ -416,18 +567,19 @@ class ValenceApp:
     def _update_model_transform(self):
         rot_x = pyrr.matrix44.create_from_x_rotation(np.radians(self._rotate_value[1]), dtype=np.float32)
         rot_y = pyrr.matrix44.create_from_y_rotation(np.radians(self._rotate_value[0]), dtype=np.float32)
+        rot_z = pyrr.matrix44.create_from_z_rotation(np.radians(self._rotate_value[2]), dtype=np.float32)
         scale_mat = pyrr.matrix44.create_from_scale([self._scale_value]*3, dtype=np.float32)
         trans_mat = pyrr.matrix44.create_from_translation(
         [self._translate_value[0], self._translate_value[1], -0.5],
         dtype=np.float32
 )
 
-        model_mat = pyrr.matrix44.multiply(rot_x, rot_y)
+        model_mat = pyrr.matrix44.multiply(rot_z, rot_x)
+        model_mat = pyrr.matrix44.multiply(model_mat, rot_y)
         model_mat = pyrr.matrix44.multiply(model_mat, scale_mat)
         model_mat = pyrr.matrix44.multiply(model_mat, trans_mat)
 
         self._model = model_mat
 
         glUseProgram(self._shader_program)
-        model_loc = glGetUniformLocation(self._shader_program, "model")
-        glUniformMatrix4fv(model_loc, 1, GL_FALSE, self._model)
+        glUniformMatrix4fv(self._uniforms["model"], 1, GL_FALSE, self._model)
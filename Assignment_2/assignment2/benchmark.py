@@ -0,0 +1,157 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+"""
+Headless rendering benchmark of the valence viewer.
+Every drawing mode of every model is rendered into an offscreen framebuffer
+of an EGL context (no window system needed) while the model spins around the
+x, y and z axes. CPU time (issuing the frame) and GPU time (GL_TIME_ELAPSED queries) are recorded per
+frame and summarized as percentiles.
+
+    python benchmark.py --report results/render.csv
+    python benchmark.py --frames 30 --modes SOLID_SMOOTH,VALENCE data/bunny.off
+"""
+
+import ctypes
+import glob
+import os
+import time
+import click
+import numpy as np
+
+import headless
+headless.use_egl()  # before the first OpenGL import
+
+from OpenGL.GL import *
+from app import ValenceApp, DrawingMode
+from report import write_report
+
+SHADER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shaders')
+PERCENTILES = (50, 90, 99)
+
+
+class FrameTimer:
+    """CPU and GPU time of every frame between begin() and end()."""
+
+    def __init__(self):
+        self.cpu_times = []
+        self._queries = []
+        self._start = None
+
+    def begin(self):
+        query = int(glGenQueries(1)[0])
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        self._queries.append(query)
+        self._start = time.perf_counter()
+
+    def end(self):
+        self.cpu_times.append(time.perf_counter() - self._start)
+        glEndQuery(GL_TIME_ELAPSED)
+
+    def gpu_times(self):
+        # Query results are only read after the run so that no frame waits on the GPU
+        times = []
+        for query in self._queries:
+            elapsed = GLuint64(0)
+            glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(elapsed))
+            times.append(elapsed.value * 1e-9)
+        glDeleteQueries(len(self._queries), self._queries)
+        self._queries = []
+        return times
+
+
+def summarize(prefix, times):
+    times_ms = np.asarray(times) * 1000
+    row = {f'{prefix}_mean_ms': float(times_ms.mean())}
+    for p, value in zip(PERCENTILES, np.percentile(times_ms, PERCENTILES)):
+        row[f'{prefix}_p{p}_ms'] = float(value)
+    return row
+
+
+def fit_to_view(app):
+    """Scale the model so that it fits the fixed camera around the origin."""
+    radius = np.max(np.linalg.norm(app._mesh_data.positions, axis=1))
+    app._scale_value = 0.12 / radius
+    app._update_model_transform()
+
+
+@click.command()
+@click.argument('models', nargs=-1)
+@click.option('--width', type=int, default=1360, help='Framebuffer width')
+@click.option('--height', type=int, default=1024, help='Framebuffer height')
+@click.option('--frames', type=int, default=90, help='Frames per rotation axis')
+@click.option('--modes', type=str, default=','.join(m.name for m in DrawingMode), help='Comma separated drawing modes')
+@click.option('--compact_vertices', is_flag=True, help='Quantized 16-bit vertex attributes and indices')
+@click.option('--report', type=str, default=None, help='Write all runs to this .csv or .jsonl file')
+def main(models, width, height, frames, modes, compact_vertices, report):
+    """Benchmark rendering of MODELS (default: data/Models/*.off)."""
+    models = models or sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'data', 'Models', '*.off')))
+    modes = [DrawingMode[name.strip().upper()] for name in modes.split(',')]
+
+    app = ValenceApp(width=width, height=height,
+                     vertex_shader_path=os.path.join(SHADER_DIR, 'basic_transformation.vert'),
+                     fragment_shader_path=os.path.join(SHADER_DIR, 'basic_color.frag'),
+                     geometry_shader_path=os.path.join(SHADER_DIR, 'wireframe.geom'),
+                     mesh_path=models[0], headless=True, compact_vertices=compact_vertices)
+
+    rows = []
+    print(f"{'model':<20} {'mode':<14} {'fps':>8} {'cpu p50':>8} {'cpu p99':>8} {'gpu p50':>8} {'gpu p99':>8}")
+    for i, model in enumerate(models):
+        if i > 0:
+            app.load_mesh(model)
+        fit_to_view(app)
+        name = os.path.splitext(os.path.basename(model))[0]
+
+        for mode in modes:
+            app._drawing_mode = mode
+            # Warm up shader variants and buffer uploads outside of the timings
+            app._update_and_draw()
+            glFinish()
+
+            timer = FrameTimer()
+            fps = app.measure_fps(frames, timer)
+            row = {'model': name, 'vertices': app._mesh_data.n_verts,
+                   'faces': len(app._mesh_data.indices) // 3, 'mode': mode.name,
+                   'compact': compact_vertices, 'frames': len(timer.cpu_times), 'fps': fps}
+            row.update(summarize('cpu', timer.cpu_times))
+            row.update(summarize('gpu', timer.gpu_times()))
+            rows.append(row)
+            print(f"{name:<20} {mode.name:<14} {fps:>8.1f} {row['cpu_p50_ms']:>8.2f} {row['cpu_p99_ms']:>8.2f} "
+                  f"{row['gpu_p50_ms']:>8.2f} {row['gpu_p99_ms']:>8.2f}")
+
+    app.destroy()
+    if report:
+        write_report(report, rows)
+        print(f"Wrote {len(rows)} runs to {report}")
+
+
+if __name__ == '__main__':
+    main()
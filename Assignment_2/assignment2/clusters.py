@@ -0,0 +1,168 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import numpy as np
+
+from vertex_attributes import unique_edges
+
+# Triangles per cluster; the index buffer is already in a spatially coherent
+# order (see vertex_cache.py), so consecutive runs of triangles stay compact
+CLUSTER_TRIANGLES = 256
+# Clusters processed at once by build_clusters; bounds its float64 corner
+# arrays to about 20 MB instead of letting them grow with the mesh
+CLUSTER_BATCH = 1024
+# Per-cluster arrays of build_clusters, stored in the mesh cache (bump
+# mesh_cache.CACHE_VERSION when their meaning or CLUSTER_TRIANGLES changes)
+CLUSTER_FIELDS = ('first', 'counts', 'centers', 'radii', 'axes', 'cutoffs')
+
+
+def build_clusters(positions: np.ndarray, indices: np.ndarray, size: int = CLUSTER_TRIANGLES,
+                   batch: int = CLUSTER_BATCH) -> dict:
+    """
+    Split a triangle index buffer into clusters of `size` consecutive
+    triangles. Every cluster gets a bounding sphere ('centers', 'radii') and a
+    normal cone ('axes', 'cutoffs') holding the normals of all its triangles;
+    'first' and 'counts' are its triangle range in the index buffer.
+    A cutoff of 1 marks a cone too wide for back-face culling, which is only
+    valid at all if the mesh is 'closed' (see closed_outward).
+    The clusters are processed `batch` at a time, so the temporary corner
+    arrays stay small however large the mesh is.
+    """
+    positions = np.asarray(positions)
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    n_clusters = -(-len(tris) // size)
+    first = np.arange(n_clusters) * size
+    counts = np.minimum(len(tris) - first, size)
+
+    centers = np.empty((n_clusters, 3))
+    radii = np.empty(n_clusters)
+    axes = np.empty((n_clusters, 3))
+    cutoffs = np.empty(n_clusters)
+    lo_all, hi_all = np.full(3, np.inf), np.full(3, -np.inf)
+    for start in range(0, n_clusters, batch):
+        part = slice(start, min(start + batch, n_clusters))
+        n = part.stop - start
+        # Pad the last cluster with copies of its last triangle so that every
+        # cluster is one row of a (n, size) array
+        rows = np.minimum(np.arange(start * size, part.stop * size), len(tris) - 1)
+        corners = np.asarray(positions[tris[rows]], dtype=np.float64).reshape(n, size * 3, 3)
+        lo, hi = corners.min(axis=1), corners.max(axis=1)
+        lo_all, hi_all = np.minimum(lo_all, lo.min(axis=0)), np.maximum(hi_all, hi.max(axis=0))
+        centers[part] = (lo + hi) / 2
+        radii[part] = np.linalg.norm(corners - centers[part, None], axis=2).max(axis=1)
+
+        corners = corners.reshape(n, size, 3, 3)
+        normals = np.cross(corners[:, :, 1] - corners[:, :, 0], corners[:, :, 2] - corners[:, :, 0])
+        lengths = np.linalg.norm(normals, axis=2)
+        normals /= np.maximum(lengths, 1e-300)[..., None]
+        axis = normals.sum(axis=1)
+        axis /= np.maximum(np.linalg.norm(axis, axis=1), 1e-300)[:, None]
+        axes[part] = axis
+        # Degenerate triangles have no normal and do not widen the cone
+        spread = np.where(lengths > 0, np.einsum('csj,cj->cs', normals, axis), 1.0).min(axis=1)
+        cutoffs[part] = np.where(spread > 0, np.sqrt(1 - np.minimum(spread, 1) ** 2), 1.0)
+    # Covers the rounding of compact (16-bit) vertex positions
+    if n_clusters:
+        radii += 1e-4 * np.max(hi_all - lo_all)
+
+    return {'first': first, 'counts': counts, 'centers': centers, 'radii': radii,
+            'axes': axes, 'cutoffs': cutoffs, 'closed': closed_outward(positions, tris)}
+
+
+def closed_outward(positions: np.ndarray, indices: np.ndarray) -> bool:
+    """
+    True if the mesh is closed, consistently oriented and its normals point
+    outwards, so that from outside no back face can ever be visible.
+    """
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    edges, counts = unique_edges(tris)
+    if len(tris) == 0 or np.any(counts != 2):
+        return False
+    # Consistent orientation: every directed edge is used exactly once
+    directed = tris * (tris.max() + 1) + np.roll(tris, -1, axis=1)
+    if len(np.unique(directed)) != directed.size:
+        return False
+    positions = np.asarray(positions)
+    volume = 0.0
+    for start in range(0, len(tris), CLUSTER_BATCH * CLUSTER_TRIANGLES):
+        corners = np.asarray(positions[tris[start:start + CLUSTER_BATCH * CLUSTER_TRIANGLES]], dtype=np.float64)
+        volume += np.einsum('fj,fj->f', corners[:, 0], np.cross(corners[:, 1], corners[:, 2])).sum()
+    return volume > 0
+
+
+def frustum_planes(matrix: np.ndarray) -> np.ndarray:
+    """
+    The six clip planes (a, b, c, d) of an object-to-clip space `matrix` in
+    the row vector convention, normalized so that a point's distance to a
+    plane is dot((x, y, z, 1), plane). Points inside have positive distances.
+    """
+    m = np.asarray(matrix, dtype=np.float64)
+    w = m[:, 3]
+    planes = np.stack([w + m[:, 0], w - m[:, 0], w + m[:, 1], w - m[:, 1], w + m[:, 2], w - m[:, 2]])
+    return planes / np.linalg.norm(planes[:, :3], axis=1)[:, None]
+
+
+def eye_position(matrix: np.ndarray) -> np.ndarray:
+    """
+    Homogeneous object space center of projection of `matrix`: the point
+    mapped to clip x = y = w = 0 (w = 0 for parallel projections, where the
+    sign of the direction is arbitrary).
+    """
+    m = np.asarray(matrix, dtype=np.float64)
+    # Left null vector of the x, y and w columns
+    u, _, _ = np.linalg.svd(m[:, [0, 1, 3]])
+    eye = u[:, 3]
+    return eye / eye[3] if abs(eye[3]) > 1e-12 else eye
+
+
+def visible_clusters(clusters: dict, matrix: np.ndarray, backface: bool = False) -> np.ndarray:
+    """
+    Boolean mask of the clusters whose bounding sphere intersects the view
+    frustum of the object-to-clip `matrix` and, with backface=True, that have
+    at least one triangle facing the eye. Back faces are only culled for
+    closed meshes and perspective projections from outside the bounding box
+    of the clusters.
+    """
+    centers, radii = clusters['centers'], clusters['radii']
+    planes = frustum_planes(matrix)
+    visible = np.all(centers @ planes[:, :3].T + planes[:, 3] >= -radii[:, None], axis=1)
+
+    eye = eye_position(matrix)
+    if backface and clusters['closed'] and eye[3] != 0:
+        # From inside the bounding box of the mesh back faces can be visible
+        eye = eye[:3]
+        inside = np.all(eye > (centers - radii[:, None]).min(axis=0)) and np.all(eye < (centers + radii[:, None]).max(axis=0))
+        if not inside:
+            view = centers - eye
+            facing_away = (np.einsum('cj,cj->c', view, clusters['axes'])
+                           >= clusters['cutoffs'] * np.linalg.norm(view, axis=1) + radii)
+            visible &= ~facing_away
+    return visible
@@ -0,0 +1,99 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+"""
+OpenGL contexts without a window system, through EGL. PyOpenGL binds its
+function pointers to one platform when OpenGL is first imported, so entry
+points that render headless call use_egl() before importing anything that
+imports OpenGL.
+"""
+
+import ctypes
+import os
+
+
+def use_egl():
+    """Make PyOpenGL load EGL; must run before the first OpenGL import."""
+    os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+    if not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY'):
+        # Mesa otherwise looks for an X or Wayland display for EGL_DEFAULT_DISPLAY
+        os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+
+class EGLContext:
+    """
+    OpenGL 3.3 core context with a width x height pbuffer surface, made
+    current on creation. Works with any EGL driver, including software
+    rasterizers such as Mesa llvmpipe.
+    """
+
+    def __init__(self, width: int, height: int):
+        if os.environ.get('PYOPENGL_PLATFORM') != 'egl':
+            raise RuntimeError("Headless rendering needs PYOPENGL_PLATFORM=egl before OpenGL is imported "
+                               "(see headless.use_egl)")
+        from OpenGL import EGL
+        self._egl = EGL
+
+        self.display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(self.display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("Failed to initialize EGL")
+
+        attributes = [EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT, EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+                      EGL.EGL_DEPTH_SIZE, 24, EGL.EGL_NONE]
+        config, n_configs = EGL.EGLConfig(), EGL.EGLint()
+        if not EGL.eglChooseConfig(self.display, (EGL.EGLint * len(attributes))(*attributes),
+                                   ctypes.pointer(config), 1, ctypes.pointer(n_configs)) or n_configs.value == 0:
+            raise RuntimeError("No EGL config with OpenGL pbuffer support")
+
+        surface_attributes = [EGL.EGL_WIDTH, width, EGL.EGL_HEIGHT, height, EGL.EGL_NONE]
+        self.surface = EGL.eglCreatePbufferSurface(self.display, config,
+                                                   (EGL.EGLint * len(surface_attributes))(*surface_attributes))
+        if self.surface == EGL.EGL_NO_SURFACE:
+            raise RuntimeError("Failed to create EGL pbuffer surface")
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attributes = [EGL.EGL_CONTEXT_MAJOR_VERSION, 3, EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+                              EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK, EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+                              EGL.EGL_NONE]
+        self.context = EGL.eglCreateContext(self.display, config, EGL.EGL_NO_CONTEXT,
+                                            (EGL.EGLint * len(context_attributes))(*context_attributes))
+        if self.context == EGL.EGL_NO_CONTEXT:
+            raise RuntimeError("Failed to create an OpenGL 3.3 core EGL context")
+        if not EGL.eglMakeCurrent(self.display, self.surface, self.surface, self.context):
+            raise RuntimeError("Failed to make the EGL context current")
+
+    def destroy(self):
+        EGL = self._egl
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        EGL.eglDestroySurface(self.display, self.surface)
+        EGL.eglTerminate(self.display)
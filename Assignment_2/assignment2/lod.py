@@ -0,0 +1,115 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import math
+import numpy as np
+import openmesh as om
+
+from vertex_cache import reorder_triangles
+
+# Face count of every coarser level relative to the full mesh
+LOD_RATIOS = (0.5, 0.25, 0.125, 0.0625)
+# Triangles per pixel of the projected bounding sphere before a coarser level is used
+LOD_TRIANGLES_PER_PIXEL = 2.0
+
+
+def lod_chain(positions: np.ndarray, indices: np.ndarray, ratios=LOD_RATIOS):
+    """
+    Index buffers of progressively coarser versions of a triangle mesh, made by
+    quadric error halfedge collapses. Collapses never move the remaining
+    vertices, so every level indexes the original vertex array. Faces that
+    OpenMesh cannot add (non-manifold configurations, repeated vertices) are
+    kept in every level.
+    Returns one flat uint32 array per ratio.
+    """
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    if len(tris) == 0:
+        # Point clouds have nothing to decimate
+        return [np.zeros(0, dtype=np.uint32) for _ in ratios]
+    # Faces with a repeated vertex crash OpenMesh; they are kept like rejected faces
+    degenerate = (tris[:, 0] == tris[:, 1]) | (tris[:, 1] == tris[:, 2]) | (tris[:, 2] == tris[:, 0])
+    valid = tris[~degenerate]
+    mesh = om.TriMesh(np.asarray(positions, dtype=np.float64), valid)
+    mesh.set_vertex_property_array('original_index', np.arange(mesh.n_vertices()))
+    # Comes back 1-D when OpenMesh rejected every face
+    rejected = np.concatenate([_rejected_faces(valid, mesh.face_vertex_indices().reshape(-1, 3)), tris[degenerate]])
+    if len(rejected) == len(tris):
+        return [tris.astype(np.uint32).ravel() for _ in ratios]
+
+    levels = []
+    for ratio in ratios:
+        # A fresh decimater per level: collapses leave deleted items behind,
+        # which have to be garbage collected before the faces can be read
+        decimater = om.TriMeshDecimater(mesh)
+        quadric = om.TriMeshModQuadricHandle()
+        decimater.add(quadric)
+        decimater.module(quadric).unset_max_err()
+        decimater.initialize()
+        decimater.decimate_to_faces(0, max(int(len(tris) * ratio) - len(rejected), 1))
+        mesh.garbage_collection()
+
+        original_index = mesh.vertex_property_array('original_index').astype(np.int64)
+        level = np.concatenate([original_index[mesh.face_vertex_indices().reshape(-1, 3)], rejected])
+        levels.append(level.astype(np.uint32).ravel())
+    return levels
+
+
+def build_lod_levels(positions: np.ndarray, indices: np.ndarray, ratios=LOD_RATIOS):
+    """
+    lod_chain with every level in vertex cache order. Only takes and returns
+    arrays, so it can run in a worker process.
+    """
+    return [reorder_triangles(positions, level)[0] for level in lod_chain(positions, indices, ratios)]
+
+
+def _rejected_faces(tris: np.ndarray, mesh_faces: np.ndarray) -> np.ndarray:
+    """Rows of tris that are missing from the OpenMesh face list."""
+    if len(mesh_faces) == len(tris):
+        return np.zeros((0, 3), dtype=np.int64)
+    combined = np.sort(np.concatenate([mesh_faces, tris]), axis=1)
+    _, inverse = np.unique(combined, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    in_mesh = np.zeros(inverse.max() + 1, dtype=bool)
+    in_mesh[inverse[:len(mesh_faces)]] = True
+    return tris[~in_mesh[inverse[len(mesh_faces):]]]
+
+
+def select_lod(face_counts, projected_radius: float, triangles_per_pixel: float = LOD_TRIANGLES_PER_PIXEL) -> int:
+    """
+    Finest level (face_counts ordered fine to coarse) that does not exceed
+    triangles_per_pixel over the area of the projected bounding sphere, given
+    its radius in pixels.
+    """
+    budget = math.pi * projected_radius ** 2 * triangles_per_pixel
+    for level, count in enumerate(face_counts):
+        if count <= budget:
+            return level
+    return len(face_counts) - 1
@@ -29,19 +29,36 @@
    Boston, MA  02110-1301, USA.
 '''
 
+import os
 import click
 from app import ValenceApp
+from mesh_cache import MeshCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE
+from lod import LOD_RATIOS
 
 # mesh_path = "D:/MBZUAI 2022-2027/MBZUAI 2024-2027/Semester 2/CV804/Exercise 1/CV804-2025-Spring-Semester-Starter-Code/assignment2/data/space_shuttle.off"
-vertex_shader_path = "D:/MBZUAI 2022-2027/MBZUAI 2024-2027/Semester 2/CV804/Exercise 1/CV804-2025-Spring-Semester-Starter-Code/assignment2/shaders/basic_transformation.vert"
-fragment_shader_path = "D:/MBZUAI 2022-2027/MBZUAI 2024-2027/Semester 2/CV804/Exercise 1/CV804-2025-Spring-Semester-Starter-Code/assignment2/shaders/basic_color.frag"
+SHADER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shaders')
+vertex_shader_path = os.path.join(SHADER_DIR, 'basic_transformation.vert')
+fragment_shader_path = os.path.join(SHADER_DIR, 'basic_color.frag')
+geometry_shader_path = os.path.join(SHADER_DIR, 'wireframe.geom')
+
 @click.command()
 # @click.option('--mesh_path', type=str, default=mesh_path, help='Mesh path')
 @click.option('--window_width', type=int, default=1360, help='Window width')
 @click.option('--window_height', type=int, default=1024, help='Window height')
-def main(window_width, window_height):
+@click.option('--cache_dir', type=str, default=DEFAULT_CACHE_DIR, help='Directory of preprocessed meshes')
+@click.option('--cache_size', type=int, default=DEFAULT_CACHE_SIZE // (1024 * 1024), help='Maximum cache size in MB')
+@click.option('--no_cache', is_flag=True, help='Always parse the mesh file')
+@click.option('--lod_levels', type=click.IntRange(0, len(LOD_RATIOS)), default=len(LOD_RATIOS), help='Number of coarser levels of detail')
+@click.option('--compact_vertices', is_flag=True, help='Quantized 16-bit vertex attributes and indices')
+@click.option('--add_mesh', type=click.Path(exists=True, dir_okay=False), multiple=True,
+              help='Another mesh to show next to the selected one, can be repeated')
+def main(window_width, window_height, cache_dir, cache_size, no_cache, lod_levels, compact_vertices, add_mesh):
+    mesh_cache = None if no_cache else MeshCache(cache_dir, cache_size * 1024 * 1024)
     app = ValenceApp(width=window_width, height=window_height, 
-                     vertex_shader_path=vertex_shader_path, fragment_shader_path=fragment_shader_path)
+                     vertex_shader_path=vertex_shader_path, fragment_shader_path=fragment_shader_path,
+                     geometry_shader_path=geometry_shader_path,
+                     mesh_cache=mesh_cache, lod_levels=lod_levels,
+                     compact_vertices=compact_vertices, extra_mesh_paths=add_mesh)
     app.run()
 
 if __name__ == '__main__':
@@ -0,0 +1,126 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+# Bump when the meaning of a cached array changes so stale entries are ignored
+CACHE_VERSION = 3
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'cv804', 'meshes')
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+
+
+class MeshCache:
+    """
+    Directory of preprocessed meshes stored as .npy files that are opened
+    memory-mapped. An entry is keyed by the absolute path, size and
+    modification time of the source file, so editing the file invalidates it.
+    Least recently used entries are evicted once the directory grows beyond
+    max_bytes.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Meshes can be loaded on several threads (see session.MeshSession)
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, filename: str) -> str:
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        ident = f"{CACHE_VERSION}|{path}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha1(ident.encode('utf-8')).hexdigest()
+
+    def load(self, filename: str):
+        """Dictionary of memory-mapped arrays cached for `filename`, or None."""
+        entry = os.path.join(self.directory, self.key(filename))
+        if not os.path.isdir(entry):
+            return None
+        try:
+            arrays = {name[:-4]: np.load(os.path.join(entry, name), mmap_mode='r')
+                      for name in os.listdir(entry) if name.endswith('.npy')}
+        except (OSError, ValueError):
+            # Unreadable array: treat it as a miss and let the next store()
+            # replace it, the entry may be in use by another loader thread
+            return None
+        os.utime(entry)
+        return arrays
+
+    def store(self, filename: str, **arrays):
+        """Add (or extend) the entry of `filename` with the given arrays."""
+        entry = os.path.join(self.directory, self.key(filename))
+        with self._lock:
+            os.makedirs(entry, exist_ok=True)
+            for name, array in arrays.items():
+                # Write next to the entry and rename so readers never see partial
+                # files; load() only maps *.npy, so temporary files are skipped
+                fd, tmp = tempfile.mkstemp(suffix='.tmp', dir=entry)
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, np.ascontiguousarray(array))
+                os.replace(tmp, os.path.join(entry, f"{name}.npy"))
+            self.evict()
+
+    def size(self) -> int:
+        return sum(size for _, size in self._entries())
+
+    def evict(self):
+        # Entries are only removed while no store() of this cache is writing
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size in entries)
+            for entry, size in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+    def clear(self):
+        with self._lock:
+            for entry, _ in self._entries():
+                shutil.rmtree(entry, ignore_errors=True)
+
+    def _entries(self):
+        """(path, bytes) of every entry, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            if not os.path.isdir(entry):
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry) if f.is_file())
+            entries.append((os.stat(entry).st_mtime, entry, size))
+        entries.sort()
+        return [(entry, size) for _, entry, size in entries]
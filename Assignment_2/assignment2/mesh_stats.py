@@ -0,0 +1,209 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+"""
+Batch statistics of a directory of meshes.
+Every mesh is read and triangulated with the viewer's reader (without its
+reordering, levels of detail, culling clusters or GPU upload, none of which
+the statistics need) in a pool of worker processes, and its valence
+histogram, normal statistics and bounding box are collected into one .json,
+.jsonl or .csv summary. Optionally a color-coded valence thumbnail of every
+mesh is rendered offscreen.
+
+    python mesh_stats.py data/Models --report results/models.json
+    python mesh_stats.py /data/assets --jobs 16 --report assets.csv --thumbnails results/thumbs
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import glob
+import os
+import time
+import click
+import numpy as np
+
+import headless
+headless.use_egl()  # thumbnails render without a window system
+
+from mesh_viewer import read_mesh, triangle_indices, vertex_normals
+from report import write_report
+from vertex_attributes import unique_edges, valence
+
+MESH_EXTENSIONS = ('.off', '.obj', '.ply', '.stl')
+
+
+def find_meshes(paths):
+    """Mesh files among `paths`, searching directories recursively."""
+    meshes = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in glob.glob(os.path.join(path, '**', '*'), recursive=True):
+                if name.lower().endswith(MESH_EXTENSIONS):
+                    meshes.append(name)
+        else:
+            meshes.append(path)
+    return sorted(set(meshes))
+
+
+def scan_root(paths) -> str:
+    """Deepest directory containing all of `paths`."""
+    dirs = [path if os.path.isdir(path) else os.path.dirname(path) for path in paths]
+    return os.path.commonpath([os.path.abspath(d) for d in dirs])
+
+
+def mesh_statistics(filename: str) -> dict:
+    """
+    Statistics of one mesh file. Errors are reported in the 'error' field so
+    that one broken asset does not stop a batch.
+    """
+    row = {'model': os.path.splitext(os.path.basename(filename))[0], 'path': filename}
+    try:
+        _collect_statistics(filename, row)
+    except Exception as e:
+        row['error'] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def _collect_statistics(filename: str, row: dict):
+    start = time.perf_counter()
+    points, faces, _ = read_mesh(filename)
+    indices, skipped = triangle_indices(points, faces)
+    row['load_seconds'] = time.perf_counter() - start
+
+    positions = np.asarray(points, dtype=np.float64)
+    tris = indices.astype(np.int64).reshape(-1, 3)
+    edges, counts = unique_edges(tris)
+    row.update(vertices=len(positions), faces=len(tris), skipped_faces=skipped, edges=len(edges),
+               boundary_edges=int(np.sum(counts == 1)), non_manifold_edges=int(np.sum(counts > 2)))
+
+    # Valences
+    valences = valence(points, indices)
+    histogram = np.bincount(valences)
+    row.update(valence_min=int(valences.min()), valence_max=int(valences.max()),
+               valence_mean=float(valences.mean()),
+               valence_histogram={int(v): int(n) for v, n in enumerate(histogram) if n})
+
+    # Bounding box
+    lo, hi = positions.min(axis=0), positions.max(axis=0)
+    row.update(bbox_min=lo.tolist(), bbox_max=hi.tolist(), bbox_extent=(hi - lo).tolist(),
+               bounding_radius=float(np.max(np.linalg.norm(positions - (lo + hi) / 2, axis=1))))
+
+    # Normals: degenerate faces, isolated vertices and how far the vertex
+    # normals deviate from the normals of their incident faces
+    corners = positions[tris]
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    face_area = 0.5 * np.linalg.norm(face_normals, axis=1)
+    face_normals /= np.maximum(2 * face_area, 1e-300)[:, None]
+    normals = vertex_normals(points, indices).astype(np.float64)
+    zero_normals = np.linalg.norm(normals, axis=1) < 1e-12
+    cos = np.einsum('fcj,fj->fc', normals[tris], face_normals)[~zero_normals[tris]]
+    deviation = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+    row.update(surface_area=float(face_area.sum()), degenerate_faces=int(np.sum(face_area <= 1e-12 * face_area.max())),
+               zero_normals=int(zero_normals.sum()),
+               normal_deviation_mean_deg=float(deviation.mean()) if len(deviation) else 0.0,
+               normal_deviation_max_deg=float(deviation.max()) if len(deviation) else 0.0,
+               flipped_normals=int(np.sum(cos < 0)))
+
+
+def render_thumbnails(rows, directory: str, size: int, root: str):
+    """
+    Render the valence mode of every loaded mesh into `directory`. Thumbnails
+    mirror the layout below `root`: <root>/a/bunny.off becomes
+    `directory`/a/bunny.off.png, so meshes with the same name do not collide.
+    """
+    # The OpenGL stack is only needed here, not in the statistics workers
+    import matplotlib.pyplot as plt
+    from OpenGL.GL import glFinish, glReadPixels, GL_RGBA, GL_UNSIGNED_BYTE
+    from app import ValenceApp, DrawingMode
+    from benchmark import SHADER_DIR
+
+    rows = [row for row in rows if 'error' not in row]
+    if not rows:
+        return
+    app = ValenceApp(width=size, height=size,
+                     vertex_shader_path=os.path.join(SHADER_DIR, 'basic_transformation.vert'),
+                     fragment_shader_path=os.path.join(SHADER_DIR, 'basic_color.frag'),
+                     geometry_shader_path=os.path.join(SHADER_DIR, 'wireframe.geom'),
+                     mesh_path=rows[0]['path'], headless=True, lod_levels=0)
+    app._drawing_mode = DrawingMode.VALENCE
+    for i, row in enumerate(rows):
+        if i > 0:
+            app.load_mesh(row['path'])
+        # Center the bounding sphere in front of the fixed camera
+        mesh = app._mesh_data
+        app._scale_value = 0.12 / max(mesh.bounding_radius, 1e-12)
+        app._translate_value = (-mesh.bounding_center[:2] * app._scale_value).astype(np.float32)
+        app._update_model_transform()
+        app._update_and_draw()
+        glFinish()
+        pixels = np.frombuffer(glReadPixels(0, 0, size, size, GL_RGBA, GL_UNSIGNED_BYTE), dtype=np.uint8)
+        relative = os.path.relpath(os.path.abspath(row['path']), root)
+        row['thumbnail'] = os.path.join(directory, f"{relative}.png")
+        os.makedirs(os.path.dirname(row['thumbnail']), exist_ok=True)
+        # OpenGL rows start at the bottom of the image
+        plt.imsave(row['thumbnail'], pixels.reshape(size, size, 4)[::-1])
+    app.destroy()
+
+
+@click.command()
+@click.argument('paths', nargs=-1)
+@click.option('--jobs', type=int, default=os.cpu_count(), help='Number of worker processes')
+@click.option('--report', type=str, default='mesh_stats.json', help='Summary .json, .jsonl or .csv file')
+@click.option('--thumbnails', type=str, default=None, help='Render a valence thumbnail of every mesh into this directory')
+@click.option('--thumbnail_size', type=int, default=256, help='Thumbnail width and height in pixels')
+def main(paths, jobs, report, thumbnails, thumbnail_size):
+    """Collect statistics of the meshes in PATHS (default: data/Models)."""
+    paths = paths or [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'Models')]
+    meshes = find_meshes(paths)
+    if not meshes:
+        raise click.UsageError(f"No mesh files ({', '.join(MESH_EXTENSIONS)}) found in {', '.join(paths)}")
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(mesh_statistics, mesh) for mesh in meshes]
+        for future in as_completed(futures):
+            row = future.result()
+            rows.append(row)
+            status = row['error'] if 'error' in row else f"{row['vertices']} vertices, valence {row['valence_mean']:.2f}"
+            print(f"[{len(rows)}/{len(meshes)}] {row['model']}: {status}")
+    rows.sort(key=lambda row: row['path'])
+    print(f"Processed {len(rows)} meshes in {time.perf_counter() - start:.1f} s")
+
+    if thumbnails:
+        render_thumbnails(rows, thumbnails, thumbnail_size, scan_root(paths))
+
+    write_report(report, rows)
+    failed = sum('error' in row for row in rows)
+    print(f"Wrote {len(rows)} meshes ({failed} failed) to {report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -34,25 +34,138 @@ import numpy as np
 from OpenGL.GL import *
 import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
+from vertex_attributes import VERTEX_ATTRIBUTES, valence
+from mesh_cache import MeshCache
+from lod import LOD_RATIOS, build_lod_levels
+from vertex_cache import optimize_order
+from clusters import CLUSTER_FIELDS, build_clusters, visible_clusters
+from off_reader import read_off
+from vertex_format import MAX_UINT16_VERTICES, quantize_positions, octahedral_encode, quantize_scalars
+
+NORMAL_WEIGHTINGS = ('uniform', 'area', 'angle')
+COLORMAP_SIZE = 256
+
+
+def colormap_table(names, size: int = COLORMAP_SIZE) -> np.ndarray:
+    """
+    Sample the matplotlib colormaps `names` into one (len(names), size, 4)
+    uint8 RGBA table, one colormap per row, for upload as a lookup texture.
+    """
+    samples = np.linspace(0.0, 1.0, size)
+    table = np.stack([plt.get_cmap(name)(samples) for name in names])
+    return np.round(table * 255).astype(np.uint8)
+
+
+def vertex_normals(positions: np.ndarray, indices: np.ndarray, weighting: str = 'uniform') -> np.ndarray:
+    """
+    Per-vertex normals of a triangle mesh as the normalized sum of the normals
+    of the incident faces. Face normals are weighted equally ('uniform'), by
+    face area ('area') or by the corner angle at the vertex ('angle').
+    Vertices without incident faces get a zero normal.
+    """
+    if weighting not in NORMAL_WEIGHTINGS:
+        raise ValueError(f"Unknown normal weighting '{weighting}', expected one of {NORMAL_WEIGHTINGS}")
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    corners = positions[tris].astype(np.float64)  # (n_faces, 3, 3)
+
+    # Cross product length is twice the face area
+    face_normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    if weighting != 'area':
+        lengths = np.linalg.norm(face_normals, axis=1, keepdims=True)
+        face_normals /= np.where(lengths > 0, lengths, 1.0)
+
+    # One weighted normal per face corner
+    corner_normals = np.repeat(face_normals[:, None, :], 3, axis=1)
+    if weighting == 'angle':
+        e1 = np.roll(corners, -1, axis=1) - corners
+        e2 = np.roll(corners, 1, axis=1) - corners
+        cos = np.einsum('fcj,fcj->fc', e1, e2)
+        sin = np.linalg.norm(np.cross(e1, e2), axis=2)
+        corner_normals *= np.arctan2(sin, cos)[:, :, None]
+
+    # Scatter-add the corner normals to their vertices. The accumulator is
+    # float from the start: bincount of no faces at all returns int64 zeros
+    flat = tris.ravel()
+    corner_normals = corner_normals.reshape(-1, 3)
+    normals = np.zeros((len(positions), 3))
+    for k in range(3):
+        normals[:, k] = np.bincount(flat, weights=corner_normals[:, k], minlength=len(positions))
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals /= np.where(lengths > 0, lengths, 1.0)
+    return normals.astype(np.float32)
+
+
+def read_mesh(filename: str):
+    """
+    Vertex positions (n, 3) and face indices (m, 3) of a mesh file, and the
+    OpenMesh structure it was read into (None for OFF files, which are parsed
+    straight into arrays; the halfedge structure is then only built by
+    MeshViewer.mesh if something needs the connectivity).
+    """
+    if filename.lower().endswith('.off'):
+        positions, faces = read_off(filename)
+        return positions, faces, None
+    mesh = om.read_trimesh(filename)
+    if mesh is None:
+        raise ValueError(f"Could not read mesh from file: {filename}")
+    return np.ascontiguousarray(mesh.points(), dtype=np.float32), mesh.face_vertex_indices(), mesh
+
+
+def triangle_indices(positions: np.ndarray, faces: np.ndarray):
+    """
+    Flatten an (m, 3) face index array into a uint32 index buffer.
+    Faces that are not triangles (padded with -1) and degenerate triangles
+    are dropped; returns the buffer and the number of degenerate triangles.
+    Out-of-range indices or non-finite positions raise.
+    """
+    faces = np.asarray(faces).reshape(-1, 3)
+    faces = faces[np.all(faces >= 0, axis=1)]
+    if len(faces) and faces.max() >= len(positions):
+        raise ValueError(f"Face index {faces.max()} out of range for {len(positions)} vertices")
+    if not np.all(np.isfinite(positions)):
+        raise ValueError("Mesh has non-finite vertex positions")
+
+    degenerate = ((faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 0] == faces[:, 2]))
+    return faces[~degenerate].astype(np.uint32).ravel(), int(np.count_nonzero(degenerate))
+
 
 class MeshViewer:
-    def __init__(self, filename: str):
-        self.mesh = om.read_trimesh(filename)
-        if self.mesh is None:
-            raise ValueError(f"Could not read mesh from file: {filename}")
-
-        print(f"Loaded mesh with {self.mesh.n_vertices()} vertices, {self.mesh.n_faces()} faces")
-        indices = []
-        for fh in self.mesh.faces():
-            vs = [vh.idx() for vh in self.mesh.fv(fh)]
-            if len(vs) == 3:
-                indices.extend(vs)
-        self.indices = np.array(indices, dtype=np.uint32)
-
-        self.n_verts = self.mesh.n_vertices()
-        self.positions = np.zeros((self.n_verts, 3), dtype=np.float32)
+    def __init__(self, filename: str, normal_weighting: str = 'uniform', cache: MeshCache = None,
+                 lod_levels: int = len(LOD_RATIOS), compact: bool = False, upload: bool = True,
+                 lod_executor=None):
+        self._filename = filename
+        self.compact = compact
+        self._cache = cache
+        # Runs the LOD decimation, e.g. in a process pool so that a loader
+        # thread does not hold the GIL for it (see session.MeshSession)
+        self._lod_executor = lod_executor
+        self._mesh = None
+
+        cached = cache.load(filename) if cache is not None else None
+        if cached is not None and {'positions', 'indices', 'valences'} <= cached.keys():
+            # Memory-mapped arrays, the text file is not parsed at all
+            self.positions = cached['positions']
+            self.indices = cached['indices']
+            self.n_verts = len(self.positions)
+            self.valences = cached['valences']
+            print(f"Loaded mesh with {self.n_verts} vertices, {len(self.indices) // 3} faces from cache")
+        else:
+            self.positions, faces, self._mesh = read_mesh(filename)
+            self.n_verts = len(self.positions)
+            print(f"Loaded mesh with {self.n_verts} vertices, {len(faces)} faces")
+            self.indices, skipped = triangle_indices(self.positions, faces)
+            if skipped:
+                print(f"Skipping {skipped} degenerate faces")
+            self._optimize_order()
+            self.valences = self.calc_valences()
+            if cache is not None:
+                cache.store(filename, positions=self.positions, indices=self.indices, valences=self.valences)
+            cached = {}
+
         self.normals   = np.zeros((self.n_verts, 3), dtype=np.float32)
-        self.valences = self.calc_valences()
+        self.normal_weighting = normal_weighting
+        self.attribute = 'valence'
+        self.scalars = self.valences
         
         # Predefined colormap options
         self._colormaps = [
@@ -69,115 +182,316 @@ class MeshViewer:
             'gist_ncar',
             'Pastel1',]
         self._colormap_index = 3  # Default colormap
-        self.colors = self.color_coding()
+        self.scalar_range = self.calc_scalar_range()
+
+        if f'normals_{normal_weighting}' in cached:
+            self.normals = cached[f'normals_{normal_weighting}']
+        else:
+            self.compute_normals()
+
+        # Bounding sphere for the screen-space level of detail selection
+        lo, hi = np.min(self.positions, axis=0), np.max(self.positions, axis=0)
+        self.bounding_center = (lo + hi) / 2
+        self.bounding_radius = float(np.max(np.linalg.norm(self.positions - self.bounding_center, axis=1)))
+        self.lod_indices = self.build_lods(lod_levels, cached)
+        # Spatial clusters of every level for view frustum and back-face culling
+        self.clusters = self.build_cluster_levels(lod_levels, cached)
 
-        for vh in self.mesh.vertices():
-            idx = vh.idx()
-            p = self.mesh.point(vh)
-            self.positions[idx] = [p[0], p[1], p[2]]
-        self.compute_normals()
+        # Model transforms of the instances that are drawn, in the same
+        # (row vector) convention as the pyrr matrices of the app
+        self.instances = np.eye(4, dtype=np.float32)[None]
 
+        self.vao = self.vbo = self.scalar_vbo = self.ebo = self.instance_vbo = self.colormap_texture = None
+        self._owns_colormap_texture = False
+        # Everything above only needs the CPU, so it can run on a loader
+        # thread; the GPU upload has to happen on the thread owning the context
+        if upload:
+            self.upload()
+
+    def upload(self, colormap_texture=None):
+        """Create the GPU buffers; colormap_texture can be shared with other meshes."""
         self._setup_gl_buffers()
+        if colormap_texture is None:
+            self._setup_colormap_texture()
+            self._owns_colormap_texture = True
+        else:
+            self.colormap_texture = colormap_texture
+
+    @property
+    def uploaded(self) -> bool:
+        return self.vao is not None
+
+    def set_instances(self, matrices: np.ndarray):
+        """Draw the mesh once per (4, 4) model transform in `matrices`."""
+        self.instances = np.ascontiguousarray(np.reshape(matrices, (-1, 4, 4)), dtype=np.float32)
+        if self.instance_vbo is not None:
+            glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+            glBufferData(GL_ARRAY_BUFFER, self.instances.nbytes, self.instances, GL_DYNAMIC_DRAW)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
 
-    def compute_normals(self):
-        self.normals.fill(0)
+    def _optimize_order(self):
+        # Triangles in cache-friendly order and vertices in order of first use;
+        # the file's OpenMesh structure no longer matches the vertex indices
+        self.indices, order, before, after = optimize_order(self.positions, self.indices)
+        self.positions = np.ascontiguousarray(self.positions[order])
+        self._mesh = None
+        print(f"Vertex cache: ACMR {before:.3f} -> {after:.3f}")
 
-        for fh in self.mesh.faces():
-            vertices = [self.mesh.point(vh) for vh in self.mesh.fv(fh)]
-            edge1 = vertices[1] - vertices[0]
-            edge2 = vertices[2] - vertices[0]
+    def build_lods(self, n_levels: int, cached: dict):
+        """
+        Coarser index buffers over the same vertices, level 0 being
+        self.indices. They are computed once and then taken from the cache.
+        """
+        name = f'lod{n_levels}'
+        if n_levels == 0:
+            return [self.indices]
+        if f'{name}_indices' in cached:
+            levels = np.split(cached[f'{name}_indices'], np.cumsum(cached[f'{name}_counts'])[:-1])
+        else:
+            args = (np.asarray(self.positions), np.asarray(self.indices), LOD_RATIOS[:n_levels])
+            if self._lod_executor is not None:
+                levels = self._lod_executor.submit(build_lod_levels, *args).result()
+            else:
+                levels = build_lod_levels(*args)
+            if self._cache is not None:
+                self._cache.store(self._filename, **{f'{name}_indices': np.concatenate(levels),
+                                                     f'{name}_counts': np.array([len(l) for l in levels])})
+        print("Levels of detail:", ', '.join(str(len(l) // 3) for l in [self.indices] + levels), "faces")
+        return [self.indices] + levels
 
-            face_normal = np.cross(edge1, edge2)
-            face_normal /= np.linalg.norm(face_normal)
+    def build_cluster_levels(self, n_levels: int, cached: dict):
+        """
+        Culling clusters (see clusters.build_clusters) of every level of
+        detail. They are computed once and then taken from the cache next to
+        the levels themselves, concatenated over the levels.
+        """
+        name = f'lod{n_levels}_clusters'
+        if f'{name}_sizes' in cached:
+            splits = np.cumsum(cached[f'{name}_sizes'])[:-1]
+            levels = [{field: array for field, array in zip(CLUSTER_FIELDS, arrays)}
+                      for arrays in zip(*(np.split(cached[f'{name}_{field}'], splits) for field in CLUSTER_FIELDS))]
+            for level, closed in zip(levels, cached[f'{name}_closed']):
+                level['closed'] = bool(closed)
+            return levels
 
-            for vh in self.mesh.fv(fh):
-                self.normals[vh.idx()] += face_normal
+        levels = [build_clusters(self.positions, level) for level in self.lod_indices]
+        if self._cache is not None:
+            arrays = {f'{name}_{field}': np.concatenate([level[field] for level in levels]) for field in CLUSTER_FIELDS}
+            self._cache.store(self._filename, **arrays,
+                              **{f'{name}_sizes': np.array([len(level['first']) for level in levels]),
+                                 f'{name}_closed': np.array([level['closed'] for level in levels])})
+        return levels
 
-        for i in range(self.normals.shape[0]):
-            self.normals[i] /= np.linalg.norm(self.normals[i])
+    def compute_normals(self, weighting: str = None):
+        # Recomputes self.normals from self.positions and self.indices, so it can
+        # be called again whenever the geometry changes.
+        if weighting is not None:
+            self.normal_weighting = weighting
+        self.normals = vertex_normals(self.positions, self.indices, self.normal_weighting)
+        if self._cache is not None:
+            self._cache.store(self._filename, **{f'normals_{self.normal_weighting}': self.normals})
+
+    @property
+    def mesh(self):
+        # The OpenMesh structure is only rebuilt from the arrays when a cached
+        # mesh is used by something that needs the halfedge connectivity
+        if self._mesh is None:
+            self._mesh = om.TriMesh(np.asarray(self.positions, dtype=np.float64), self.indices.reshape(-1, 3))
+        return self._mesh
 
     def calc_valences(self):
-        # Compute valence of every vertex of "self.mesh"
-        # Initialize an array to store the valence of each vertex
-        valences = np.zeros(self.n_verts, dtype=np.int32)
-        # Iterate over all vertices in the mesh
-        for vh in self.mesh.vertices():
-            # Set the valence of the current vertex (number of edges connected to it)
-            valences[vh.idx()] = self.mesh.valence(vh)
-        # Return the array of valences
-        return valences
+        # Compute valence of every vertex of "self.mesh" (number of edges
+        # connected to it) with one bincount over the edges of the index buffer
+        return valence(self.positions, self.indices)
+
+    def set_attribute(self, name: str):
+        """Color code the per-vertex attribute `name` (see VERTEX_ATTRIBUTES)."""
+        if name not in VERTEX_ATTRIBUTES:
+            raise ValueError(f"Unknown vertex attribute '{name}', expected one of {list(VERTEX_ATTRIBUTES)}")
+        self.attribute = name
+        self.scalars = self.valences if name == 'valence' else VERTEX_ATTRIBUTES[name](self.positions, self.indices)
+        self.scalar_range = self.calc_scalar_range()
+        if self.scalar_vbo is not None:
+            self._upload_scalars()
+
+    def calc_scalar_range(self):
+        """Range of self.scalars that is mapped onto the colormap."""
+        if np.issubdtype(self.scalars.dtype, np.integer):
+            # Find the minimum and maximum valence in the mesh
+            min_value, max_value = np.min(self.scalars), np.max(self.scalars)
+        else:
+            # Continuous attributes: clip outliers so they do not flatten the colormap
+            min_value, max_value = np.percentile(self.scalars, [1, 99])
+        return float(min_value), float(max_value)
 
     def color_coding(self):
         # Implement a color visualization of your choice that shows the valence of
-        # each vertex of "self.mesh".
-        # Find the minimum valence in the mesh
-        min_valence = np.min(self.valences)
-        # Find the maximum valence in the mesh
-        max_valence = np.max(self.valences)
-        # Normalize the valences to the range [0, 1]
-        norm_valences = (self.valences - min_valence) / (max_valence - min_valence + 1e-6)
-        # Get a colormap from matplotlib (viridis in this case)
-        # colormap = plt.get_cmap("prism")
+        # each vertex of "self.mesh" (or the currently selected vertex attribute).
+        # The viewer does the same lookup in the fragment shader; this is the CPU
+        # equivalent for exporting per-vertex colors.
+        min_value, max_value = self.scalar_range
+        # Normalize the values to the range [0, 1]
+        norm_values = np.clip((self.scalars - min_value) / (max_value - min_value + 1e-6), 0, 1)
         colormap = plt.get_cmap(self._colormaps[self._colormap_index])
-        # colors = [
-        # (1.0, 0.44, 0.20),  # Burning Orange
-        # (0.94, 0.53, 0.25), # Jaffa
-        # (0.93, 0.64, 0.26), # Fuel Yellow
-        # (0.76, 0.58, 0.24), # Old Gold
-        # (0.45, 0.77, 0.40)  # Mantis
-        # ]
-        # colormap = LinearSegmentedColormap.from_list("custom_colormap", colors, N=256)
-        
-        # Map the normalized valences to RGB colors using the colormap
-        colors = colormap(norm_valences)[:, :3]  # Get RGB values
-        # print(colors.min(), colors.max())
+        # Map the normalized values to RGB colors using the colormap
+        colors = colormap(norm_values)[:, :3]  # Get RGB values
         # Return the colors as a float32 numpy array
-        # return np.random.rand(self.n_verts, 3)
         return colors.astype(np.float32)
 
-    def set_colormap(self, index: str):
+    def set_colormap(self, index: int):
+        # All colormaps live in the lookup texture, so switching only changes
+        # the row that the fragment shader samples
         self._colormap_index = index
-        self.colors = self.color_coding()  # Recompute colors with new colormap
-    
-    def _setup_gl_buffers(self):
-        print(self.positions.shape, self.normals.shape, self.colors.shape)
 
-        n_verts = len(self.positions)
-        interleaved = np.concatenate([
-            self.positions, self.normals, self.colors
-        ], axis=1).astype(np.float32).ravel()
+    def _setup_gl_buffers(self):
+        print(self.positions.shape, self.normals.shape, self.scalars.shape)
 
-        self.vao = glGenVertexArrays(1)
+        # Buffers are created once and refilled when the vertex data changes
+        if self.vao is None:
+            self.vao = glGenVertexArrays(1)
+            self.vbo = glGenBuffers(1)
+            self.scalar_vbo = glGenBuffers(1)
+            self.instance_vbo = glGenBuffers(1)
+            self.ebo = glGenBuffers(1)
         glBindVertexArray(self.vao)
 
-        self.vbo = glGenBuffers(1)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-        glBufferData(GL_ARRAY_BUFFER, interleaved.nbytes, interleaved, GL_STATIC_DRAW)
+        if self.compact:
+            # 12 bytes per vertex: quantized position and octahedral normal,
+            # decoded in the vertex shader with self.position_decode
+            quantized, offset, scale = quantize_positions(self.positions)
+            interleaved = np.concatenate([quantized, octahedral_encode(self.normals).view(np.uint16)], axis=1)
+            self.position_decode = (offset, scale)
+            stride = interleaved.shape[1] * interleaved.itemsize
+            glBufferData(GL_ARRAY_BUFFER, interleaved.nbytes, interleaved, GL_STATIC_DRAW)
 
-        self.ebo = glGenBuffers(1)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices.nbytes, self.indices, GL_STATIC_DRAW)
+            glEnableVertexAttribArray(0)
+            glVertexAttribPointer(0, 3, GL_UNSIGNED_SHORT, GL_TRUE, stride, ctypes.c_void_p(0))
+
+            glEnableVertexAttribArray(1)
+            glVertexAttribPointer(1, 2, GL_SHORT, GL_TRUE, stride, ctypes.c_void_p(8))
+        else:
+            interleaved = np.concatenate([
+                self.positions, self.normals
+            ], axis=1).astype(np.float32).ravel()
+            self.position_decode = (np.zeros(3, dtype=np.float32), np.ones(3, dtype=np.float32))
+            stride = 6 * np.dtype(np.float32).itemsize
+            glBufferData(GL_ARRAY_BUFFER, interleaved.nbytes, interleaved, GL_STATIC_DRAW)
 
-        stride = 9 * np.dtype(np.float32).itemsize
+            glEnableVertexAttribArray(0)
+            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
 
-        glEnableVertexAttribArray(0)
-        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(0))
+            glEnableVertexAttribArray(1)
+            glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(12))
 
-        glEnableVertexAttribArray(1)
-        glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(12))
+        # All levels of detail share the vertices and live in one index buffer
+        lod_indices = np.concatenate(self.lod_indices)
+        if self.compact and self.n_verts <= MAX_UINT16_VERTICES:
+            lod_indices = lod_indices.astype(np.uint16)
+        self.index_type = GL_UNSIGNED_SHORT if lod_indices.dtype == np.uint16 else GL_UNSIGNED_INT
+        offsets = np.cumsum([0] + [len(l) for l in self.lod_indices])
+        self.lod_ranges = [(int(offsets[i]) * lod_indices.itemsize, len(l)) for i, l in enumerate(self.lod_indices)]
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, lod_indices.nbytes, lod_indices, GL_STATIC_DRAW)
 
+        # The scalar attribute has its own buffer so it can be replaced alone
+        glBindBuffer(GL_ARRAY_BUFFER, self.scalar_vbo)
         glEnableVertexAttribArray(2)
-        glVertexAttribPointer(2, 3, GL_FLOAT, GL_FALSE, stride, ctypes.c_void_p(24))
+        if self.compact:
+            glVertexAttribPointer(2, 1, GL_UNSIGNED_SHORT, GL_TRUE, 0, ctypes.c_void_p(0))
+        else:
+            glVertexAttribPointer(2, 1, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
+
+        # One model matrix per instance, as four vec4 attributes advancing per instance
+        glBindBuffer(GL_ARRAY_BUFFER, self.instance_vbo)
+        for column in range(4):
+            glEnableVertexAttribArray(3 + column)
+            glVertexAttribPointer(3 + column, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(16 * column))
+            glVertexAttribDivisor(3 + column, 1)
 
         glBindVertexArray(0)
+        self.set_instances(self.instances)
+        self._upload_scalars()
+
+    def _upload_scalars(self):
+        if self.compact:
+            scalars, offset, scale = quantize_scalars(self.scalars)
+            self.scalar_decode = (offset, scale)
+        else:
+            scalars = np.ascontiguousarray(self.scalars, dtype=np.float32)
+            self.scalar_decode = (0.0, 1.0)
+        glBindBuffer(GL_ARRAY_BUFFER, self.scalar_vbo)
+        glBufferData(GL_ARRAY_BUFFER, scalars.nbytes, scalars, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _setup_colormap_texture(self):
+        # Every colormap is one row of a 2D lookup texture; nearest filtering
+        # matches matplotlib's own lookup into its 256 entry table
+        table = colormap_table(self._colormaps)
+        self.colormap_texture = glGenTextures(1)
+        glBindTexture(GL_TEXTURE_2D, self.colormap_texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, table.shape[1], table.shape[0], 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, table)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def visible_ranges(self, lod: int, view_projection: np.ndarray, backface: bool = False):
+        """
+        Byte offsets and index counts of the runs of clusters of level `lod`
+        that are visible in any instance, given the model-to-clip matrix
+        `view_projection` applied after the instance transforms.
+        """
+        clusters = self.clusters[lod]
+        visible = np.zeros(len(clusters['first']), dtype=bool)
+        for instance in self.instances:
+            visible |= visible_clusters(clusters, instance @ view_projection, backface)
+
+        # Neighbouring clusters are contiguous in the index buffer, so every
+        # run of visible clusters is drawn as one range
+        edges = np.diff(np.concatenate([[False], visible, [False]]).astype(np.int8))
+        starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+        first = clusters['first']
+        item_size = 2 if self.index_type == GL_UNSIGNED_SHORT else 4
+        offsets = self.lod_ranges[lod][0] + first[starts] * 3 * item_size
+        counts = (first[ends] + clusters['counts'][ends] - first[starts]) * 3
+        return offsets, counts.astype(np.int32)
 
-    def draw(self):
+    def draw(self, lod: int = 0, view_projection: np.ndarray = None, backface: bool = False):
+        """
+        Draw level `lod` of every instance. With a `view_projection` matrix,
+        only the clusters inside the view frustum (and with backface=True,
+        facing the camera) are drawn.
+        """
         # print("Drawing with colormap", self._colormaps[self._colormap_index])
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.colormap_texture)
         glBindVertexArray(self.vao)
-        glDrawElements(GL_TRIANGLES, len(self.indices), GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        if view_projection is None:
+            offset, count = self.lod_ranges[lod]
+            glDrawElementsInstanced(GL_TRIANGLES, count, self.index_type, ctypes.c_void_p(offset), len(self.instances))
+        else:
+            offsets, counts = self.visible_ranges(lod, view_projection, backface)
+            if len(self.instances) == 1 and len(counts):
+                glMultiDrawElements(GL_TRIANGLES, counts, self.index_type,
+                                    (ctypes.c_void_p * len(offsets))(*offsets.tolist()), len(counts))
+            else:
+                # Without multi-draw for instances in OpenGL 3.3 every range is a draw call
+                for offset, count in zip(offsets.tolist(), counts.tolist()):
+                    glDrawElementsInstanced(GL_TRIANGLES, count, self.index_type, ctypes.c_void_p(offset),
+                                            len(self.instances))
         glBindVertexArray(0)
 
     def destroy(self):
+        if not self.uploaded:
+            return
         glDeleteVertexArrays(1, [self.vao])
         glDeleteBuffers(1, [self.vbo])
+        glDeleteBuffers(1, [self.scalar_vbo])
+        glDeleteBuffers(1, [self.instance_vbo])
         glDeleteBuffers(1, [self.ebo])
+        if self._owns_colormap_texture:
+            glDeleteTextures(1, [self.colormap_texture])
+        self.vao = None
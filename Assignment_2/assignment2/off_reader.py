@@ -0,0 +1,150 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import re
+
+import numpy as np
+
+# Bytes parsed at once; the chunk is extended to the end of its last line
+CHUNK_BYTES = 16 * 1024 * 1024
+_COMMENT = re.compile(rb'#[^\n]*')
+
+
+def read_off(filename: str, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Read an ASCII OFF file (including the COFF, NOFF and STOFF variants) into
+    (n_verts, 3) float32 positions and (n_triangles, 3) uint32 triangles.
+    The vertex and face blocks are parsed chunk by chunk with numpy, and
+    polygons are triangulated as fans around their first vertex, like
+    OpenMesh does.
+    """
+    with open(filename, 'rb') as f:
+        header = []
+        while len(header) < 4:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"{filename}: truncated OFF header")
+            header += _COMMENT.sub(b'', line).split()
+        keyword = header[0].decode('ascii', 'replace')
+        if not keyword.endswith('OFF') or keyword.lstrip('STCN') != 'OFF':
+            raise ValueError(f"{filename}: unsupported OFF variant '{keyword}'")
+        try:
+            n_verts, n_faces = int(header[1]), int(header[2])
+        except ValueError:
+            raise ValueError(f"{filename}: malformed or binary OFF header") from None
+
+        positions = np.empty((n_verts, 3), dtype=np.float32)
+        triangles = []
+        filled = faces_read = 0
+        while filled < n_verts or faces_read < n_faces:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                raise ValueError(f"{filename}: expected {n_verts} vertices and {n_faces} faces, "
+                                 f"found {filled} and {faces_read}")
+            chunk += f.readline()
+            if b'#' in chunk:
+                chunk = _COMMENT.sub(b'', chunk)
+            if not chunk.endswith(b'\n'):
+                chunk += b'\n'
+            starts, counts = _line_tokens(chunk)
+            line_starts = np.append(starts, len(chunk))
+
+            # The first lines complete the vertex block, the following ones the face block
+            n = min(n_verts - filled, len(starts))
+            if n:
+                block = chunk[:line_starts[n]]
+                positions[filled:filled + n] = _parse_vertices(block, counts[:n], filename)
+                filled += n
+            m = min(n_faces - faces_read, len(starts) - n)
+            if m:
+                block = chunk[line_starts[n]:line_starts[n + m]]
+                triangles.append(_parse_faces(block, counts[n:n + m], filename))
+                faces_read += m
+
+    triangles = np.concatenate(triangles) if triangles else np.zeros((0, 3), dtype=np.int64)
+    if len(triangles) and (triangles.min() < 0 or triangles.max() >= n_verts):
+        raise ValueError(f"{filename}: face index out of range for {n_verts} vertices")
+    return positions, triangles.astype(np.uint32)
+
+
+def _line_tokens(block: bytes):
+    """Start byte and number of tokens of every non-blank line of `block`."""
+    data = np.frombuffer(block, dtype=np.uint8)
+    space = data <= ord(' ')
+    newlines = np.flatnonzero(data == ord('\n'))
+    token_starts = np.flatnonzero(~space & np.concatenate([[True], space[:-1]]))
+    counts = np.bincount(np.searchsorted(newlines, token_starts), minlength=len(newlines))
+    starts = np.concatenate([[0], newlines[:-1] + 1])
+    return starts[counts > 0], counts[counts > 0]
+
+
+def _parse_numbers(block: bytes, count: int, dtype) -> np.ndarray:
+    try:
+        values = np.fromstring(block, dtype=dtype, sep=' ')
+    except ValueError:
+        values = None
+    if values is None or len(values) != count:
+        return None
+    return values
+
+
+def _parse_vertices(block: bytes, counts: np.ndarray, filename: str) -> np.ndarray:
+    values = _parse_numbers(block, counts.sum(), np.float64)
+    if values is None or np.any(counts < 3):
+        raise ValueError(f"{filename}: malformed vertex line")
+    if np.all(counts == counts[0]):
+        return values.reshape(len(counts), -1)[:, :3]
+    # Extra columns (colors, normals) on some lines only
+    line_start = np.cumsum(counts) - counts
+    return values[line_start[:, None] + np.arange(3)]
+
+
+def _parse_faces(block: bytes, counts: np.ndarray, filename: str) -> np.ndarray:
+    """Fan triangulation of the polygon lines 'n i_0 ... i_n-1 [color]'."""
+    # Integers parse much faster, colors after the indices need floats
+    values = _parse_numbers(block, counts.sum(), np.int64)
+    if values is None:
+        values = _parse_numbers(block, counts.sum(), np.float64)
+    if values is None:
+        raise ValueError(f"{filename}: malformed face line")
+    line_start = np.cumsum(counts) - counts
+    sizes = values[line_start].astype(np.int64)
+    if np.any(sizes < 0) or np.any(sizes + 1 > counts):
+        raise ValueError(f"{filename}: face with fewer indices than its vertex count")
+
+    if np.all(sizes == 3) and np.all(counts == 4):
+        return values.reshape(-1, 4)[:, 1:].astype(np.int64)
+    # Triangle j of a face is (i_0, i_j+1, i_j+2)
+    n_triangles = np.maximum(sizes - 2, 0)
+    face = np.repeat(np.arange(len(counts)), n_triangles)
+    j = np.arange(n_triangles.sum()) - np.repeat(np.cumsum(n_triangles) - n_triangles, n_triangles)
+    first = line_start[face] + 1
+    return np.stack([values[first], values[first + j + 1], values[first + j + 2]], axis=1).astype(np.int64)
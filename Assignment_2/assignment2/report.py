@@ -0,0 +1,58 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import csv
+import json
+import os
+
+
+def write_report(filename, rows):
+    """
+    Write a list of dictionaries as a .csv table, .jsonl lines or (any other
+    extension) one JSON list. Dictionaries and lists inside CSV cells are
+    stored as JSON.
+    """
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    if filename.lower().endswith('.csv'):
+        fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({key: json.dumps(value) if isinstance(value, (dict, list)) else value
+                                 for key, value in row.items()})
+    elif filename.lower().endswith('.jsonl'):
+        with open(filename, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+    else:
+        with open(filename, 'w') as f:
+            json.dump(rows, f, indent=2)
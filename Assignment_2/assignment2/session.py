@@ -0,0 +1,177 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
+
+import numpy as np
+import pyrr
+
+from mesh_viewer import MeshViewer
+from mesh_cache import MeshCache
+from lod import LOD_RATIOS
+
+# Distance between the centers of auto-placed objects, in bounding radii
+PLACEMENT_SPACING = 2.2
+
+
+class MeshSession:
+    """
+    The meshes shown together in one viewer. Every distinct file becomes one
+    MeshViewer with its own vertex and index buffers; opening the same file
+    again only adds an instance transform, so repeated meshes are drawn with a
+    single instanced draw call. All objects share the colormap texture of the
+    first one.
+
+    Files are parsed on a background thread by load(); poll() has to be called
+    from the thread that owns the OpenGL context to upload finished loads.
+    The LOD decimation holds the GIL for long stretches, so the loader threads
+    hand it to a worker process to keep the render loop responsive.
+    """
+    def __init__(self, cache: MeshCache = None, lod_levels: int = len(LOD_RATIOS), compact: bool = False,
+                 workers: int = 2):
+        self._cache = cache
+        self._lod_levels = lod_levels
+        self._compact = compact
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._lod_executor = None
+        if lod_levels > 0:
+            # Spawned rather than forked: the parent has threads and a GL context
+            self._lod_executor = ProcessPoolExecutor(max_workers=workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        self.objects = []
+        self._by_path = {}
+        self._pending = []
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    @property
+    def loading(self) -> bool:
+        return bool(self._pending)
+
+    def load(self, path: str, transform: np.ndarray = None):
+        """
+        Start loading `path` in the background. `transform` is the (4, 4)
+        object transform in the row vector convention of pyrr; by default the
+        object is scaled to the first mesh and placed to the right of the others.
+        """
+        key = os.path.abspath(path)
+        if key not in self._by_path and all(p[0] != key for p in self._pending):
+            future = self._executor.submit(self._read, path)
+        else:
+            future = None
+        self._pending.append((key, transform, future))
+
+    def load_now(self, path: str, transform: np.ndarray = None) -> MeshViewer:
+        """
+        Load `path` and upload it before returning. Only waits for this file;
+        other pending loads keep running and are uploaded by poll().
+        """
+        self.load(path, transform)
+        request = self._pending.pop()
+        key = request[0]
+        # A file that is still loading from an earlier request is finished first
+        requests = [r for r in self._pending if r[0] == key and r[2] is not None][:1] + [request]
+        for r in requests:
+            if r is not request:
+                self._pending.remove(r)
+            if r[2] is not None:
+                r[2].result()  # Raises if this file failed to load
+            self._finish(*r)
+        return self._by_path[key]
+
+    def _read(self, path: str) -> MeshViewer:
+        return MeshViewer(path, cache=self._cache, lod_levels=self._lod_levels, compact=self._compact,
+                          upload=False, lod_executor=self._lod_executor)
+
+    def poll(self) -> int:
+        """Upload the loads that finished, in the order they were requested."""
+        uploaded = 0
+        while self._pending:
+            key, transform, future = self._pending[0]
+            if future is not None and not future.done():
+                break
+            self._pending.pop(0)
+            uploaded += self._finish(key, transform, future)
+        return uploaded
+
+    def _finish(self, key: str, transform: np.ndarray, future) -> bool:
+        """Upload a finished load, or add an instance of an already loaded file."""
+        if future is not None:
+            try:
+                viewer = future.result()
+            except Exception as e:
+                print(f"Failed to load {key}: {e}")
+                return False
+            viewer.set_instances(self._placement(viewer) if transform is None else transform)
+            viewer.upload(self.objects[0].colormap_texture if self.objects else None)
+            self.objects.append(viewer)
+            self._by_path[key] = viewer
+            return True
+        if key not in self._by_path:
+            # The first request for this file failed
+            return False
+        viewer = self._by_path[key]
+        if transform is None:
+            transform = self._placement(viewer)
+        viewer.set_instances(np.concatenate([viewer.instances, np.reshape(transform, (1, 4, 4))]))
+        return True
+
+    def _placement(self, viewer: MeshViewer) -> np.ndarray:
+        placed = sum(len(v.instances) for v in self.objects)
+        if placed == 0:
+            return np.eye(4, dtype=np.float32)
+        first = self.objects[0]
+        scale = first.bounding_radius / max(viewer.bounding_radius, 1e-12)
+        offset = first.bounding_center + [PLACEMENT_SPACING * first.bounding_radius * placed, 0.0, 0.0]
+        transform = pyrr.matrix44.create_from_translation(-viewer.bounding_center, dtype=np.float32)
+        transform = transform @ pyrr.matrix44.create_from_scale([scale] * 3, dtype=np.float32)
+        return transform @ pyrr.matrix44.create_from_translation(offset, dtype=np.float32)
+
+    def clear(self):
+        """Destroy all objects; loads still running are discarded."""
+        for _, _, future in self._pending:
+            if future is not None:
+                future.cancel()
+        self._pending = []
+        # The shared colormap texture belongs to the first object
+        for viewer in reversed(self.objects):
+            viewer.destroy()
+        self.objects = []
+        self._by_path = {}
+
+    def destroy(self):
+        self.clear()
+        self._executor.shutdown(wait=False)
+        if self._lod_executor is not None:
+            self._lod_executor.shutdown(wait=False, cancel_futures=True)
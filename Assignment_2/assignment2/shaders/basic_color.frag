@@ -33,11 +33,13 @@
 
 #version 330 core
 
-in vec3 fragPos;
-in vec3 fragNormal;
-in vec3 fragColor;
-
-flat in vec3 flatNormal;
+in FragmentData {
+    vec3 fragPos;
+    vec3 fragNormal;
+    float fragScalar;
+    flat vec3 flatNormal;
+    noperspective vec3 edgeDistance;  // window-space distance to the triangle edges
+};
 
 out vec4 finalColor;
 
@@ -55,14 +57,23 @@ struct Material {
     float shininess;
 };
 
-uniform Light lights[3];
-uniform Material material;
+// Static lighting, uploaded as a uniform buffer only when it changes
+layout(std140) uniform Lighting {
+    Light lights[3];
+    Material material;
+};
 uniform vec3 viewPos;
 uniform int useValenceColor;
 uniform int shadingMode;     // 0 for flat, 1 for smooth
 uniform int enableLighting;  // 1 to enable lighting, 0 to disable
 uniform vec4 faceColor;      // Color for faces in wireframe/hidden line modes
 uniform float colorScale;    // colorScale to increase/decrease the brightness
+uniform sampler2D colormaps; // one colormap per row
+uniform int colormapIndex;   // row of the active colormap
+uniform int wireframeOverlay; // 1 to draw the triangle edges on top of the faces
+uniform vec4 backgroundColor; // face color of the hidden line mode
+
+const float edgeWidth = 1.0; // in pixels
 
 vec3 calculateLight(Light light, vec3 normal, vec3 fragPos, vec3 viewDir, vec3 baseColor) {
     // Ambient
@@ -83,10 +94,23 @@ vec3 calculateLight(Light light, vec3 normal, vec3 fragPos, vec3 viewDir, vec3 b
 
 void main()
 {
+    // 1 on the triangle edges, fading to 0 over one pixel; both triangles of
+    // an edge draw half of the line width
+    float edge = 0.0;
+    if (wireframeOverlay == 1) {
+        float d = min(edgeDistance.x, min(edgeDistance.y, edgeDistance.z));
+        edge = 1.0 - smoothstep(0.5 * edgeWidth - 0.5, 0.5 * edgeWidth + 0.5, d);
+    }
+
     if (enableLighting == 0) {
-        finalColor = faceColor; // Render without lighting
+        // Render without lighting; faces of the overlay take the background color
+        finalColor = (wireframeOverlay == 1) ? mix(backgroundColor, faceColor, edge) : faceColor;
     } else {
-        vec3 baseColor = (useValenceColor == 1) ? fragColor : vec3(1.0, 1.0, 1.0);
+        float row = (float(colormapIndex) + 0.5) / float(textureSize(colormaps, 0).y);
+        vec3 valenceColor = texture(colormaps, vec2(fragScalar, row)).rgb;
+        vec3 baseColor = (useValenceColor == 1) ? valenceColor : vec3(1.0, 1.0, 1.0);
+        // Edges are drawn as lit white lines (lighting is linear in the base color)
+        baseColor = mix(baseColor, vec3(1.0, 1.0, 1.0), edge);
 
         // Choose the normal based on the shading mode
         vec3 normal = (shadingMode == 0) ? flatNormal : fragNormal;
@@ -34,35 +34,60 @@
 #version 330 core
 
 layout(location = 0) in vec3 vertexPos;
-layout(location = 1) in vec3 vertexNormal;
-layout(location = 2) in vec3 vertexColor;
+layout(location = 1) in vec3 vertexNormal;  // only xy (octahedral) in the compact format
+layout(location = 2) in float vertexScalar;
+layout(location = 3) in mat4 instanceModel;  // per-instance object transform
 
 uniform mat4 model;
 uniform mat4 view;
 uniform mat4 projection;
+uniform vec2 scalarRange;   // scalar values mapped to the ends of the colormap
+
+// Decoding of the compact vertex format; identity for float vertices
+uniform int compactVertices;
+uniform vec3 positionOffset;
+uniform vec3 positionScale;
+uniform vec2 scalarDecode;  // offset, scale
 
 uniform int shadingMode; // 0 for flat, 1 for smooth
 
-out vec3 fragPos;
-out vec3 fragNormal;
-out vec3 fragColor;
+out VertexData {
+    vec3 fragPos;
+    vec3 fragNormal;
+    float fragScalar;
+    flat vec3 flatNormal;
+};
 
-flat out vec3 flatNormal;
+vec3 octDecode(vec2 e)
+{
+    vec3 n = vec3(e, 1.0 - abs(e.x) - abs(e.y));
+    if (n.z < 0.0) {
+        vec2 signs = vec2(n.x >= 0.0 ? 1.0 : -1.0, n.y >= 0.0 ? 1.0 : -1.0);
+        n.xy = (1.0 - abs(n.yx)) * signs;
+    }
+    return normalize(n);
+}
 
 void main()
 {
-    gl_Position = projection * view * model * vec4(vertexPos, 1.0);
+    vec3 position = positionOffset + positionScale * vertexPos;
+    vec3 normal = (compactVertices == 1) ? octDecode(vertexNormal.xy) : vertexNormal;
+    float scalar = scalarDecode.x + scalarDecode.y * vertexScalar;
+
+    mat4 objectModel = model * instanceModel;
+    gl_Position = projection * view * objectModel * vec4(position, 1.0);
 
-    mat3 normalMatrix = transpose(inverse(mat3(model)));
+    mat3 normalMatrix = transpose(inverse(mat3(objectModel)));
 
     // For flat shading, pass the normal as a constant per face
     if (shadingMode == 0) {
-        flatNormal = normalize(normalMatrix * vertexNormal);
+        flatNormal = normalize(normalMatrix * normal);
     }
 
     // For smooth shading, interpolate the normal
-    fragNormal = normalize(normalMatrix * vertexNormal);
+    fragNormal = normalize(normalMatrix * normal);
 
-    fragPos = (model * vec4(vertexPos, 1.0)).xyz;
-    fragColor = vertexColor;
+    fragPos = (objectModel * vec4(position, 1.0)).xyz;
+    float extent = max(scalarRange.y - scalarRange.x, 1e-6);
+    fragScalar = clamp((scalar - scalarRange.x) / extent, 0.0, 1.0);
 }
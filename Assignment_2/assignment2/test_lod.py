@@ -0,0 +1,66 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import numpy as np
+
+from lod import LOD_RATIOS, lod_chain
+from mesh_viewer import MeshViewer
+
+
+def test_lod_chain_without_faces():
+    levels = lod_chain(np.random.rand(4, 3), np.zeros(0, dtype=np.uint32))
+    assert len(levels) == len(LOD_RATIOS)
+    assert all(level.dtype == np.uint32 and len(level) == 0 for level in levels)
+
+
+def test_lod_chain_keeps_faces_openmesh_rejects():
+    # Every face repeats a vertex, so OpenMesh does not add any of them
+    tris = np.array([[0, 0, 1], [2, 3, 3]])
+    levels = lod_chain(np.random.rand(4, 3), tris.ravel())
+    assert all(np.array_equal(level, tris.ravel()) for level in levels)
+
+
+def test_lod_chain_decimates():
+    # Closed octahedron
+    positions = np.array([[1, 0, 0], [-1, 0, 0], [0, 1, 0], [0, -1, 0], [0, 0, 1], [0, 0, -1]], dtype=np.float64)
+    tris = np.array([[0, 2, 4], [2, 1, 4], [1, 3, 4], [3, 0, 4], [2, 0, 5], [1, 2, 5], [3, 1, 5], [0, 3, 5]])
+    levels = lod_chain(positions, tris.ravel(), ratios=(0.5,))
+    assert len(levels[0]) % 3 == 0 and 0 < len(levels[0]) < tris.size
+    assert levels[0].max() < len(positions)
+
+
+def test_point_cloud_loads_with_default_levels(tmp_path):
+    filename = tmp_path / 'points.off'
+    filename.write_text("OFF\n4 0 0\n0 0 0\n1 0 0\n0 1 0\n0 0 1\n")
+    viewer = MeshViewer(str(filename), upload=False)
+    assert len(viewer.lod_indices) == len(LOD_RATIOS) + 1
+    assert all(len(level) == 0 for level in viewer.lod_indices)
+    assert not np.any(viewer.normals)
@@ -0,0 +1,93 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import numpy as np
+
+
+def unique_edges(indices: np.ndarray):
+    """
+    Undirected edges of a triangle index buffer.
+    Returns the (n_edges, 2) vertex pairs (smaller index first) and the number
+    of triangles sharing each edge (1 on the boundary).
+    """
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    edges = np.stack([tris, np.roll(tris, -1, axis=1)], axis=2).reshape(-1, 2)
+    edges.sort(axis=1)
+    # One integer key per edge: a 1D unique is much faster than unique rows
+    n = int(edges.max()) + 1 if len(edges) else 1
+    keys, counts = np.unique(edges[:, 0] * n + edges[:, 1], return_counts=True)
+    return np.stack([keys // n, keys % n], axis=1), counts
+
+
+def valence(positions: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Number of edges incident to every vertex."""
+    edges, _ = unique_edges(indices)
+    return np.bincount(edges.ravel(), minlength=len(positions)).astype(np.int32)
+
+
+def _corner_angles(corners: np.ndarray) -> np.ndarray:
+    e1 = np.roll(corners, -1, axis=1) - corners
+    e2 = np.roll(corners, 1, axis=1) - corners
+    cos = np.einsum('fcj,fcj->fc', e1, e2)
+    sin = np.linalg.norm(np.cross(e1, e2), axis=2)
+    return np.arctan2(sin, cos)
+
+
+def vertex_area(positions: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Barycentric vertex area: a third of the area of every incident triangle."""
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    corners = positions[tris].astype(np.float64)
+    face_area = 0.5 * np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis=1)
+    return np.bincount(tris.ravel(), weights=np.repeat(face_area / 3, 3), minlength=len(positions))
+
+
+def gaussian_curvature(positions: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Discrete Gaussian curvature: angle deficit divided by the vertex area."""
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    angles = _corner_angles(positions[tris].astype(np.float64))
+    angle_sum = np.bincount(tris.ravel(), weights=angles.ravel(), minlength=len(positions))
+
+    # Boundary vertices have a deficit relative to pi instead of 2 pi
+    edges, counts = unique_edges(tris)
+    full_angle = np.full(len(positions), 2 * np.pi)
+    full_angle[np.unique(edges[counts == 1])] = np.pi
+
+    area = vertex_area(positions, tris)
+    return np.where(area > 0, (full_angle - angle_sum) / np.where(area > 0, area, 1.0), 0.0)
+
+
+# Per-vertex scalar attributes that can be color coded; each maps
+# (positions, triangle indices) to one value per vertex.
+VERTEX_ATTRIBUTES = {
+    'valence': valence,
+    'area': vertex_area,
+    'curvature': gaussian_curvature,
+}
@@ -0,0 +1,115 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import numpy as np
+
+# Post-transform cache modelled when reporting the average cache miss ratio
+CACHE_SIZE = 32
+MORTON_BITS = 10
+
+
+def acmr(indices: np.ndarray, cache_size: int = CACHE_SIZE, max_triangles: int = 100000) -> float:
+    """
+    Average cache miss ratio: vertex shader invocations per triangle with a
+    FIFO post-transform cache of cache_size entries. Only the first
+    max_triangles triangles are simulated, which is a good estimate for large
+    meshes since the ordering is local.
+    """
+    indices = np.asarray(indices).ravel()[:3 * max_triangles].tolist()
+    cache = [-1] * cache_size
+    cached = set()
+    head = misses = 0
+    for vertex in indices:
+        if vertex not in cached:
+            misses += 1
+            cached.discard(cache[head])
+            cache[head] = vertex
+            cached.add(vertex)
+            head = (head + 1) % cache_size
+    return misses / max(len(indices) // 3, 1)
+
+
+def morton_codes(points: np.ndarray, bits: int = MORTON_BITS) -> np.ndarray:
+    """Z-order curve index of points quantized to 2^bits cells per axis of their bounding box."""
+    lo, hi = points.min(axis=0), points.max(axis=0)
+    cells = ((points - lo) / np.maximum(hi - lo, 1e-12) * ((1 << bits) - 1)).astype(np.uint64)
+    codes = np.zeros(len(points), dtype=np.uint64)
+    for bit in range(bits):
+        for axis in range(3):
+            codes |= ((cells[:, axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(3 * bit + axis)
+    return codes
+
+
+def triangle_order(positions: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """Order of the triangles along a Z-order curve through their centroids."""
+    tris = np.asarray(indices, dtype=np.int64).reshape(-1, 3)
+    if len(tris) == 0:
+        return np.zeros(0, dtype=np.int64)
+    centroids = positions[tris].astype(np.float64).mean(axis=1)
+    return np.argsort(morton_codes(centroids), kind='stable')
+
+
+def vertex_order(n_vertices: int, indices: np.ndarray) -> np.ndarray:
+    """Vertices in order of first use by the index buffer, unreferenced vertices last."""
+    indices = np.asarray(indices, dtype=np.int64).ravel()
+    used, first = np.unique(indices, return_index=True)
+    order = used[np.argsort(first)]
+    unused = np.setdiff1d(np.arange(n_vertices), used, assume_unique=True)
+    return np.concatenate([order, unused])
+
+
+def reorder_triangles(positions: np.ndarray, indices: np.ndarray):
+    """
+    Triangles sorted along a Z-order curve, unless the given order already
+    has a lower average cache miss ratio. Returns the flat index buffer and
+    the ACMR before and after.
+    """
+    tris = np.asarray(indices, dtype=np.uint32).reshape(-1, 3)
+    before = acmr(tris)
+    reordered = tris[triangle_order(positions, tris)]
+    after = acmr(reordered)
+    if after >= before:
+        return tris.ravel(), before, before
+    return reordered.ravel(), before, after
+
+
+def optimize_order(positions: np.ndarray, indices: np.ndarray):
+    """
+    Reorder triangles for post-transform cache reuse and vertices for
+    sequential fetches. Returns the new index buffer, the vertex order such
+    that positions[order] (and any other per-vertex array) matches it, and the
+    ACMR before and after.
+    """
+    tris, before, after = reorder_triangles(positions, indices)
+    order = vertex_order(len(positions), tris)
+    remap = np.empty(len(order), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+    return remap[tris].astype(np.uint32), order, before, after
@@ -0,0 +1,73 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import numpy as np
+
+# Largest vertex count that 16-bit indices can address
+MAX_UINT16_VERTICES = 1 << 16
+
+
+def quantize_positions(positions: np.ndarray):
+    """
+    Positions as unsigned 16-bit integers over their bounding box, padded to
+    four components for alignment. Returns the (n, 4) uint16 array and the
+    offset and scale that decode them: offset + scale * (q / 65535).
+    """
+    lo = np.min(positions, axis=0).astype(np.float64)
+    extent = np.maximum(np.max(positions, axis=0) - lo, 1e-12)
+    quantized = np.zeros((len(positions), 4), dtype=np.uint16)
+    quantized[:, :3] = np.round((positions - lo) / extent * 65535)
+    return quantized, lo.astype(np.float32), extent.astype(np.float32)
+
+
+def octahedral_encode(normals: np.ndarray) -> np.ndarray:
+    """
+    Unit normals as two signed 16-bit components of their octahedral
+    projection (decoded with octDecode in basic_transformation.vert).
+    """
+    n = np.asarray(normals, dtype=np.float64)
+    p = n[:, :2] / np.maximum(np.sum(np.abs(n), axis=1, keepdims=True), 1e-12)
+    # Fold the lower hemisphere over the diagonals
+    lower = n[:, 2] < 0
+    folded = (1 - np.abs(p[lower][:, ::-1])) * np.where(p[lower] >= 0, 1.0, -1.0)
+    p[lower] = folded
+    return np.round(np.clip(p, -1, 1) * 32767).astype(np.int16)
+
+
+def quantize_scalars(scalars: np.ndarray):
+    """
+    Scalars as unsigned 16-bit integers over their range. Returns the uint16
+    array and the offset and scale that decode them.
+    """
+    lo, hi = float(np.min(scalars)), float(np.max(scalars))
+    scale = max(hi - lo, 1e-12)
+    quantized = np.round((np.asarray(scalars, dtype=np.float64) - lo) / scale * 65535).astype(np.uint16)
+    return quantized, lo, scale
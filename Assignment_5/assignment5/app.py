@@ -30,15 +30,18 @@
 '''
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 import glfw
 import openmesh as om
 import numpy as np
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileProgram, compileShader
 from viewer import Viewer
-from registration import Registration
-from closest_point import ClosestPoint
-from transformation import Transformation
+from icp import ICP
+from transformation import Transformation, TransformationStack
+from registration_worker import RegistrationWorker
+from telemetry import IcpTelemetry
+import point_io
 
 class RegistrationViewerApp(Viewer):
     def __init__(self, title, width, height):
@@ -50,9 +53,21 @@ class RegistrationViewerApp(Viewer):
         self.num_processed = 0
         self.sampled_points = []
         self.output_filename = ""
+        self.voxel_size = 0.0
+        self.closest_point_backend = "kdtree"
+        self.closest_point_radius = 0.0
+        self.icp = None
         self.average_vertex_distance = 0.0
         self.mode = "VIEW"
-        self.registration = Registration()
+        self.mesh_buffers = []
+        self.point_vao = None
+        self.point_vbo = None
+        self.points_dirty = False
+        self.registration_iterations = 20
+        self.registration_tolerance = 1e-3
+        self.worker = RegistrationWorker()
+        self.registration_runs = 0
+        self.metrics_filename = None
         self.setup_shaders()
         glClearColor(0.1, 0.1, 0.1, 1.0)
         glEnable(GL_DEPTH_TEST)
@@ -92,6 +107,8 @@ class RegistrationViewerApp(Viewer):
         self.mesh_view_loc = glGetUniformLocation(self.mesh_shader, "view")
         self.mesh_projection_loc = glGetUniformLocation(self.mesh_shader, "projection")
         self.enable_lighting_loc = glGetUniformLocation(self.mesh_shader, "enableLighting")
+        self.mesh_position_attr = glGetAttribLocation(self.mesh_shader, "position")
+        self.mesh_normal_attr = glGetAttribLocation(self.mesh_shader, "normal")
         glUseProgram(0)
 
         # Point shader
@@ -112,47 +129,54 @@ class RegistrationViewerApp(Viewer):
         glUseProgram(self.point_shader)
         self.point_modelview_loc = glGetUniformLocation(self.point_shader, "modelview")
         self.point_projection_loc = glGetUniformLocation(self.point_shader, "projection")
+        self.point_position_attr = glGetAttribLocation(self.point_shader, "position")
         glUseProgram(0)
 
-    def set_output(self, filename):
+    def set_metrics_output(self, filename):
+        """Append per-iteration ICP metrics to `filename` as JSON lines."""
+        self.metrics_filename = filename
+
+    def set_output(self, filename, voxel_size=0.0):
         self.output_filename = filename
+        self.voxel_size = voxel_size
 
     def open_meshes(self, filenames):
         for fname in filenames:
             print(f"Loading mesh: {fname}")
-            mesh = om.read_trimesh(fname)
+        if len(filenames) > 1:
+            # OpenMesh parsing holds the GIL, so scans are read in separate processes
+            with ProcessPoolExecutor(max_workers=min(len(filenames), os.cpu_count() or 1)) as executor:
+                scans = list(executor.map(point_io.read_mesh_arrays, filenames))
+        else:
+            scans = [point_io.read_mesh_arrays(fname) for fname in filenames]
+
+        for points, faces in scans:
             # Center the mesh
-            vertices = np.array([mesh.point(vh) for vh in mesh.vertices()])
-            center = np.mean(vertices, axis=0)
-            for vh in mesh.vertices():
-                mesh.set_point(vh, mesh.point(vh) - center)
+            points = points - points.mean(axis=0)
+            mesh = om.TriMesh(points, faces)
             mesh.request_vertex_normals()
             mesh.request_face_normals()
             mesh.update_normals()
             self.meshes.append(mesh)
             self.transformations.append(Transformation())
             # Calculate average vertex distance
-            edges = np.array([[mesh.point(mesh.from_vertex_handle(mesh.halfedge_handle(eh, 0))),
-                   mesh.point(mesh.to_vertex_handle(mesh.halfedge_handle(eh, 0)))] for eh in mesh.edges()])
-            self.average_vertex_distance = np.mean(np.linalg.norm(edges[:, 0] - edges[:, 1], axis=1))
+            edges = mesh.edge_vertex_indices()
+            self.average_vertex_distance = np.mean(np.linalg.norm(points[edges[:, 0]] - points[edges[:, 1]], axis=1))
             print(f"Mesh vertices: {mesh.n_vertices()}, faces: {mesh.n_faces()}")
 
         self.update_indices()
+        for i in range(len(self.meshes)):
+            self.upload_mesh(i)
         self.num_processed = min(2, len(self.meshes))
         self.cur_index = max(0, self.num_processed - 1)
-        bb_min = np.min([np.min(np.array([mesh.point(vh) for vh in m.vertices()]), axis=0) for m in self.meshes], axis=0)
-        bb_max = np.max([np.max(np.array([mesh.point(vh) for vh in m.vertices()]), axis=0) for m in self.meshes], axis=0)
+        bb_min = np.min([m.points().min(axis=0) for m in self.meshes], axis=0)
+        bb_max = np.max([m.points().max(axis=0) for m in self.meshes], axis=0)
         center = (bb_min + bb_max) / 2
         radius = np.linalg.norm(bb_max - bb_min)
         self.set_scene(center, radius * 0.5)
 
     def update_indices(self):
-        self.indices = []
-        for mesh in self.meshes:
-            idx = []
-            for fh in mesh.faces():
-                idx.extend([vh.idx() for vh in mesh.fv(fh)])
-            self.indices.append(np.array(idx, dtype=np.uint32))
+        self.indices = [mesh.face_vertex_indices().astype(np.uint32).ravel() for mesh in self.meshes]
 
     def display(self):
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -186,9 +210,10 @@ class RegistrationViewerApp(Viewer):
             glUniform3f(glGetUniformLocation(self.mesh_shader, f"lights[{i}].specular"),
                         light_colors[i][0] * 0.8, light_colors[i][1] * 0.8, light_colors[i][2] * 0.8)
 
+        # Model matrices of all processed scans at once
+        model_matrices = TransformationStack.from_transformations(self.transformations[:self.num_processed]).to_matrices()
         for i in range(self.num_processed):
-            transform = self.transformations[i].to_matrix()
-            glUniformMatrix4fv(self.mesh_model_loc, 1, GL_FALSE, transform.T)
+            glUniformMatrix4fv(self.mesh_model_loc, 1, GL_FALSE, model_matrices[i].T)
 
             if i != self.cur_index:
                 glUniform3f(glGetUniformLocation(self.mesh_shader, "material.ambient"), 0.4, 0.4, 0.4)
@@ -209,67 +234,96 @@ class RegistrationViewerApp(Viewer):
 
         glUseProgram(0)
 
-    def draw_mesh(self, index):
+    def upload_mesh(self, index):
+        """
+        Upload positions, normals and indices of mesh `index` to the GPU.
+        Buffers are created on the first call and refilled afterwards, so this
+        only needs to be called again when the geometry of the mesh changes.
+        """
         mesh = self.meshes[index]
-        vao = glGenVertexArrays(1)
-        glBindVertexArray(vao)
+        vertices = np.ascontiguousarray(mesh.points(), dtype=np.float32)
+        normals = np.ascontiguousarray(mesh.vertex_normals(), dtype=np.float32)
+        indices = self.indices[index]
+
+        if index < len(self.mesh_buffers):
+            buffers = self.mesh_buffers[index]
+        else:
+            buffers = {
+                "vao": glGenVertexArrays(1),
+                "vbo": glGenBuffers(1),
+                "normal_vbo": glGenBuffers(1),
+                "ibo": glGenBuffers(1),
+            }
+            self.mesh_buffers.append(buffers)
+        buffers["count"] = len(indices)
+
+        glBindVertexArray(buffers["vao"])
 
         # Vertex positions
-        vertices = np.array([mesh.point(vh) for vh in mesh.vertices()], dtype=np.float32)
-        vbo = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
-        glBufferData(GL_ARRAY_BUFFER, vertices, GL_STATIC_DRAW)
-        pos_loc = glGetAttribLocation(self.mesh_shader, "position")
-        glVertexAttribPointer(pos_loc, 3, GL_FLOAT, GL_FALSE, 0, None)
-        glEnableVertexAttribArray(pos_loc)
+        glBindBuffer(GL_ARRAY_BUFFER, buffers["vbo"])
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+        glVertexAttribPointer(self.mesh_position_attr, 3, GL_FLOAT, GL_FALSE, 0, None)
+        glEnableVertexAttribArray(self.mesh_position_attr)
 
         # Vertex normals
-        normals = np.array([mesh.normal(vh) for vh in mesh.vertices()], dtype=np.float32)
-        normal_loc = glGetAttribLocation(self.mesh_shader, "normal")
-        if normal_loc != -1:
-            normal_vbo = glGenBuffers(1)
-            glBindBuffer(GL_ARRAY_BUFFER, normal_vbo)
-            glBufferData(GL_ARRAY_BUFFER, normals, GL_STATIC_DRAW)
-            glVertexAttribPointer(normal_loc, 3, GL_FLOAT, GL_FALSE, 0, None)
-            glEnableVertexAttribArray(normal_loc)
+        if self.mesh_normal_attr != -1:
+            glBindBuffer(GL_ARRAY_BUFFER, buffers["normal_vbo"])
+            glBufferData(GL_ARRAY_BUFFER, normals.nbytes, normals, GL_STATIC_DRAW)
+            glVertexAttribPointer(self.mesh_normal_attr, 3, GL_FLOAT, GL_FALSE, 0, None)
+            glEnableVertexAttribArray(self.mesh_normal_attr)
+
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, buffers["ibo"])
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
 
-        ibo = glGenBuffers(1)
-        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, ibo)
-        glBufferData(GL_ELEMENT_ARRAY_BUFFER, self.indices[index], GL_STATIC_DRAW)
+        glBindVertexArray(0)
 
-        glDrawElements(GL_TRIANGLES, len(self.indices[index]), GL_UNSIGNED_INT, None)
+    def cleanup(self):
+        self.worker.cancel()
+        for buffers in self.mesh_buffers:
+            glDeleteVertexArrays(1, [buffers["vao"]])
+            glDeleteBuffers(3, [buffers["vbo"], buffers["normal_vbo"], buffers["ibo"]])
+        self.mesh_buffers = []
+        if self.point_vao is not None:
+            glDeleteVertexArrays(1, [self.point_vao])
+            glDeleteBuffers(1, [self.point_vbo])
+            self.point_vao = None
+            self.point_vbo = None
 
+    def draw_mesh(self, index):
+        buffers = self.mesh_buffers[index]
+        glBindVertexArray(buffers["vao"])
+        glDrawElements(GL_TRIANGLES, buffers["count"], GL_UNSIGNED_INT, None)
         glBindVertexArray(0)
-        glDeleteVertexArrays(1, [vao])
-        glDeleteBuffers(1, [vbo])
-        if normal_loc != -1:
-            glDeleteBuffers(1, [normal_vbo])
-        glDeleteBuffers(1, [ibo])
 
-    def draw_points(self):
+    def upload_points(self):
+        # Sampled points are uploaded in mesh coordinates; the current
+        # transformation is applied through the modelview uniform.
         mesh = self.meshes[self.cur_index]
-        vertices = np.array([mesh.point(vh) for vh in mesh.vertices()], dtype=np.float32)
-        points = np.array([self.transformations[self.cur_index].transform_point(
-            vertices[idx]) for idx in self.sampled_points], dtype=np.float32)
-        
-        vao = glGenVertexArrays(1)
-        glBindVertexArray(vao)
+        points = np.ascontiguousarray(mesh.points()[self.sampled_points], dtype=np.float32)
 
-        vbo = glGenBuffers(1)
-        glBindBuffer(GL_ARRAY_BUFFER, vbo)
-        glBufferData(GL_ARRAY_BUFFER, points, GL_STATIC_DRAW)
-        pos_loc = glGetAttribLocation(self.point_shader, "position")
-        glVertexAttribPointer(pos_loc, 3, GL_FLOAT, GL_FALSE, 0, None)
-        glEnableVertexAttribArray(pos_loc)
+        if self.point_vao is None:
+            self.point_vao = glGenVertexArrays(1)
+            self.point_vbo = glGenBuffers(1)
 
-        glUniformMatrix4fv(self.point_modelview_loc, 1, GL_FALSE, self.modelview.T)
+        glBindVertexArray(self.point_vao)
+        glBindBuffer(GL_ARRAY_BUFFER, self.point_vbo)
+        glBufferData(GL_ARRAY_BUFFER, points.nbytes, points, GL_DYNAMIC_DRAW)
+        glVertexAttribPointer(self.point_position_attr, 3, GL_FLOAT, GL_FALSE, 0, None)
+        glEnableVertexAttribArray(self.point_position_attr)
+        glBindVertexArray(0)
+        self.points_dirty = False
+
+    def draw_points(self):
+        if self.points_dirty:
+            self.upload_points()
 
+        modelview = self.modelview @ self.transformations[self.cur_index].to_matrix()
+        glUniformMatrix4fv(self.point_modelview_loc, 1, GL_FALSE, modelview.T)
+
+        glBindVertexArray(self.point_vao)
         glPointSize(10)
         glDrawArrays(GL_POINTS, 0, len(self.sampled_points))
-
         glBindVertexArray(0)
-        glDeleteVertexArrays(1, [vao])
-        glDeleteBuffers(1, [vbo])
 
     def keyboard(self, window, key, scancode, action, mods):
         if action != glfw.PRESS:
@@ -285,7 +339,9 @@ class RegistrationViewerApp(Viewer):
             print("Register point-2-point...")
             self.perform_registration(False)
         elif key == glfw.KEY_N:
+            self.worker.cancel()
             self.sampled_points.clear()
+            self.points_dirty = True
             self.num_processed = min(self.num_processed + 1, len(self.meshes))
             self.cur_index = (self.cur_index + 1) % len(self.meshes)
             print(f"Process scan {self.cur_index} of {len(self.meshes)}")
@@ -295,6 +351,9 @@ class RegistrationViewerApp(Viewer):
 
     def mouse(self, window, button, action, mods):
         self.mode = "MOVE" if (mods & glfw.MOD_SHIFT) else "VIEW"
+        if self.mode == "MOVE" and action == glfw.PRESS:
+            # Manual placement overrides a running registration
+            self.worker.cancel()
         super().mouse(window, button, action, mods)
 
     def motion(self, window, x, y):
@@ -315,134 +374,76 @@ class RegistrationViewerApp(Viewer):
         else:
             super().motion(window, x, y)
 
-    def perform_registration(self, tangential_motion):
-        mesh = self.meshes[self.cur_index]
-        src_pts = np.array([mesh.point(vh) for vh in mesh.vertices()])
-        self.sampled_points = self.subsample(src_pts)
-        src = [self.transformations[self.cur_index].transform_point(src_pts[i]) for i in self.sampled_points]
-        target_mesh = self.meshes[0]
-        target = np.array([target_mesh.point(vh) for vh in target_mesh.vertices()])
-        target_normals = np.array([target_mesh.normal(vh) for vh in target_mesh.vertices()])
-
-        cp = ClosestPoint()
-        cp.init(target)
-        src_f, target_f, target_n_f = [], [], []
-        self.calculate_correspondences(src, target, target_normals, cp, src_f, target_f, target_n_f)
-
-        tr = (self.registration.register_point2surface(src_f, target_f, target_n_f) if tangential_motion
-              else self.registration.register_point2point(src_f, target_f))
-        self.transformations[self.cur_index] = tr * self.transformations[self.cur_index]
-    
-    def subsample(self, pts):
+    def set_closest_point_backend(self, backend, radius=0.0):
         """
-        Task 1: Sample points uniformly on the source mesh.
-        Goal: Average distance between sampled points should be ~subsample_radius.
+        Select the nearest-neighbor backend used for correspondences.
+        'bvh' matches against the closest points on the target triangles.
+        `radius` bounds the search of the 'approx', 'grid' and 'bvh' backends;
+        0 uses 8 times the average edge length, or no bound for 'bvh'.
         """
-        subsample_radius = self.average_vertex_distance * 8  # parameter, e.g., 8 times average edge length
-        sampled = []
-        indices = list(range(len(pts)))
-        
-        # Shuffle indices randomly
-        np.random.shuffle(indices)
-        
-        for idx in indices:
-            p = pts[idx]
-            # If no points have been sampled yet, accept the first one.
-            if not sampled:
-                sampled.append(idx)
-            else:
-                # Check distance to every already sampled point.
-                keep = True
-                for s_idx in sampled:
-                    if np.linalg.norm(p - pts[s_idx]) < subsample_radius:
-                        keep = False
-                        break
-                if keep:
-                    sampled.append(idx)
-        
-        return sampled
+        self.closest_point_backend = backend
+        self.closest_point_radius = radius
+        self.icp = None
+
+    def get_icp(self):
+        # The target scan does not move, so its search structure is built once
+        if self.icp is None:
+            target_mesh = self.meshes[0]
+            self.icp = ICP(target_mesh.points(), target_mesh.vertex_normals(), self.average_vertex_distance,
+                           backend=self.closest_point_backend, radius=self.closest_point_radius,
+                           iterations=self.registration_iterations, tolerance=self.registration_tolerance,
+                           target_faces=target_mesh.face_vertex_indices())
+        return self.icp
 
-
-    def calculate_correspondences(self, src, target, target_normals, cp, src_f, target_f, target_n_f):
+    def perform_registration(self, tangential_motion):
+        """Start ICP on the current scan in the background; see ICP.run."""
+        mesh = self.meshes[self.cur_index]
+        icp = self.get_icp()
+        self.registration_runs += 1
+        telemetry = IcpTelemetry(self.metrics_filename, run=self.registration_runs, scan=self.cur_index,
+                                 mode="point2surface" if tangential_motion else "point2point",
+                                 backend=self.closest_point_backend)
+        index = self.cur_index
+        src_pts = mesh.points().copy()
+        transformation = self.transformations[index]
+
+        def job(publish, cancelled):
+            icp.run(src_pts, transformation, tangential_motion, telemetry,
+                    publish=lambda transformation, sampled_points: publish((index, transformation, sampled_points)),
+                    cancelled=cancelled)
+            timings = ", ".join(f"{stage} {t * 1000:.1f} ms" for stage, t in telemetry.summary().items())
+            print(f"Registration timings: {timings}")
+
+        self.worker.submit(job)
+
+    def idle(self):
+        for index, transformation, sampled_points in self.worker.poll():
+            self.transformations[index] = transformation
+            if index == self.cur_index:
+                self.sampled_points = sampled_points
+                self.points_dirty = True
+
+    def transformed_scans(self):
         """
-        Task 2: Find closest points and reject bad pairs.
-        - For each source point in src, use cp.get_closest_point(point) to find the index of its closest target point.
-        - Compute the distance manually.
-        - Reject pairs where the distance is greater than 3 times the median distance.
-        - Compute the unit vector from the target point to the source point and ensure its dot product with the target normal
-        is above 0.5 (i.e. angle < 60°).
-        - Update the filtered lists: src_f, target_f, and target_n_f.
+        The scans under their current transformations as (points, normals)
+        blocks. Consecutive scans are transformed together by one stack call
+        until a block holds TransformationStack.CHUNK_SIZE points, so memory
+        stays bounded by the block and not by the whole data set.
         """
-        # Build candidate correspondence lists
-        src_candidate_pts = []
-        target_candidate_pts = []
-        target_candidate_normals = []
-        candidate_distances = []
-
-        # For each source point, find the index of its closest target point.
-        for point in src:
-            try:
-                best_index = cp.get_closest_point(point)
-            except Exception as e:
-                print("ClosestPoint error:", e)
-                continue
-            
-            # Retrieve the closest target point and compute the distance
-            closest_pt = target[best_index]
-            d = np.linalg.norm(point - closest_pt)
-            
-            src_candidate_pts.append(point)
-            target_candidate_pts.append(closest_pt)
-            target_candidate_normals.append(target_normals[best_index])
-            candidate_distances.append(d)
-        
-        print("calculate_correspondences: candidate num:", len(src_candidate_pts))
-        
-        if len(candidate_distances) == 0:
-            return
-
-        # Compute the median distance and set the distance threshold (3x median)
-        median_distance = np.median(candidate_distances)
-        dist_threshold = 3 * median_distance
-
-        # Normal compatibility: require dot product > cos(60°) = 0.5
-        normal_threshold = 0.5
-
-        # Prune candidate correspondences based on distance and normal compatibility.
-        for i in range(len(src_candidate_pts)):
-            d = candidate_distances[i]
-            if d > dist_threshold:
-                continue
-
-            # Compute the unit vector from the target point to the source point.
-            vec = src_candidate_pts[i] - target_candidate_pts[i]
-            norm_vec = np.linalg.norm(vec)
-            if norm_vec == 0:
-                continue
-            vec_unit = vec / norm_vec
-
-            # Check normal compatibility: dot product should be > 0.5
-            dot_val = np.dot(vec_unit, target_candidate_normals[i])
-            if dot_val < normal_threshold:
+        stack = TransformationStack.from_transformations(self.transformations)
+        batch, batch_points = [], 0
+        for index, mesh in enumerate(self.meshes):
+            batch.append(index)
+            batch_points += mesh.n_vertices()
+            if batch_points < TransformationStack.CHUNK_SIZE and index + 1 < len(self.meshes):
                 continue
-
-            # If the candidate passes the checks, add it to the filtered lists.
-            src_f.append(src_candidate_pts[i])
-            target_f.append(target_candidate_pts[i])
-            target_n_f.append(target_candidate_normals[i])
-
+            pose_indices = np.repeat(batch, [self.meshes[i].n_vertices() for i in batch])
+            points = np.concatenate([self.meshes[i].points() for i in batch])
+            normals = np.concatenate([self.meshes[i].vertex_normals() for i in batch])
+            yield stack.transform_points(points, pose_indices), stack.rotate_vectors(normals, pose_indices)
+            batch, batch_points = [], 0
 
     def save_points(self):
-        with open(self.output_filename, 'w') as f:
-            for i, mesh in enumerate(self.meshes):
-                pts = np.array([mesh.point(vh) for vh in mesh.vertices()]) 
-                normals = np.array([mesh.normal(vh) for vh in mesh.vertices()])
-                transformed_pts = self.transformations[i].transform_points(pts)
-
-                rotation_matrix = self.transformations[i].rotation
-                transformed_normals = np.dot(normals, rotation_matrix.T)
-
-                for pt, normal in zip(transformed_pts, transformed_normals):
-                    f.write(f"v {pt[0]:.4f} {pt[1]:.4f} {pt[2]:.4f} vn {normal[0]:.6f} {normal[1]:.6f} {normal[2]:.6f}\n")
-        
+        n_points = sum(mesh.n_vertices() for mesh in self.meshes)
+        point_io.save_points(self.output_filename, self.transformed_scans(), n_points, self.voxel_size)
         print(f"Saved points to {self.output_filename}")
@@ -0,0 +1,191 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho, Ekaterina Radionova
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+"""
+Synthetic ICP benchmark with known ground truth.
+Every model is registered against a copy of itself that was moved by a random
+rigid transformation and perturbed with Gaussian noise, for both
+point-to-point and point-to-plane registration and several sampling radii.
+
+    python benchmark.py --report results/bench.csv
+    python benchmark.py --samples 4,8 --trials 5 Models/bunny.off
+"""
+
+import csv
+import glob
+import json
+import os
+import time
+import click
+import numpy as np
+import openmesh as om
+import point_io
+from icp import ICP, STOP_CONVERGED
+from telemetry import IcpTelemetry
+from transformation import Transformation
+
+
+def make_blob(resolution=64):
+    """Closed, bumpy and asymmetric sphere-like surface as (points, faces)."""
+    n_lat, n_lon = resolution // 2, resolution
+    theta = np.linspace(0, np.pi, n_lat + 1)[1:-1]
+    phi = np.linspace(0, 2 * np.pi, n_lon, endpoint=False)
+    t, p = np.meshgrid(theta, phi, indexing='ij')
+    r = 1 + 0.2 * np.sin(3 * t) * np.cos(2 * p) + 0.1 * np.cos(5 * p + t)
+    ring = np.stack([r * np.sin(t) * np.cos(p), r * np.sin(t) * np.sin(p), r * np.cos(t)], axis=-1).reshape(-1, 3)
+    points = np.vstack([[0, 0, 1.0], ring, [0, 0, -1.0]])
+
+    south = len(points) - 1
+    idx = 1 + np.arange((n_lat - 1) * n_lon).reshape(n_lat - 1, n_lon)
+    nxt = np.roll(idx, -1, axis=1)
+    quads_a = np.stack([idx[:-1], idx[1:], nxt[1:]], axis=-1).reshape(-1, 3)
+    quads_b = np.stack([idx[:-1], nxt[1:], nxt[:-1]], axis=-1).reshape(-1, 3)
+    north_cap = np.stack([np.zeros(n_lon, dtype=int), idx[0], nxt[0]], axis=-1)
+    south_cap = np.stack([np.full(n_lon, south), nxt[-1], idx[-1]], axis=-1)
+    faces = np.vstack([north_cap, quads_a, quads_b, south_cap])
+    return points, faces
+
+
+def load_model(name):
+    if name == 'blob':
+        return make_blob()
+    return point_io.read_mesh_arrays(name)
+
+
+def random_transformation(rng, max_angle, max_translation):
+    axis = rng.normal(size=3)
+    direction = rng.normal(size=3)
+    direction /= np.linalg.norm(direction)
+    translation = direction * rng.uniform(0, max_translation)
+    return Transformation(rng.uniform(0, max_angle), axis, translation)
+
+
+def run_case(icp, points, tangential_motion, gt, noise, rng):
+    """Register a moved and noisy copy of `points` and compare the result to the ground truth `gt`."""
+    source = gt.transform_points(points) + rng.normal(scale=noise, size=points.shape)
+    telemetry = IcpTelemetry()
+    start = time.perf_counter()
+    tr, iterations, stop_reason = icp.run(source, Transformation(), tangential_motion, telemetry)
+    elapsed = time.perf_counter() - start
+
+    # tr should undo gt, so their composition should be the identity
+    residual = tr * gt
+    error = np.linalg.norm(residual.transform_points(points) - points, axis=1)
+    iteration_times = [r['total_time'] for r in telemetry.records]
+    samples = [r['samples'] for r in telemetry.records if 'samples' in r]
+    return {
+        'iterations': iterations,
+        'stop_reason': stop_reason,
+        'total_time': elapsed,
+        'time_per_iteration': float(np.mean(iteration_times)) if iteration_times else 0.0,
+        'samples': float(np.mean(samples)) if samples else 0.0,
+        'rotation_error': float(residual.angle()),
+        'translation_error': float(np.linalg.norm(residual.translation)),
+        'rms_error': float(np.sqrt(np.mean(error ** 2))),
+    }
+
+
+def write_report(filename, rows):
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    if filename.lower().endswith('.csv'):
+        with open(filename, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(filename, 'w') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+
+
+@click.command()
+@click.argument('models', nargs=-1)
+@click.option('--samples', type=str, default='2,4,8', help='Comma separated subsampling radii, in average edge lengths')
+@click.option('--trials', type=int, default=3, help='Random transformations per model and setting')
+@click.option('--max_angle', type=float, default=10.0, help='Maximum rotation of the moved copy in degrees')
+@click.option('--max_translation', type=float, default=0.05, help='Maximum translation, relative to the bounding box diagonal')
+@click.option('--noise', type=float, default=0.1, help='Noise standard deviation, relative to the average edge length')
+@click.option('--iterations', type=int, default=50, help='Maximum ICP iterations')
+@click.option('--backend', type=click.Choice(['kdtree', 'approx', 'grid', 'bvh']), default='kdtree', help='Nearest-neighbor backend')
+@click.option('--seed', type=int, default=0, help='Random seed')
+@click.option('--report', type=str, default=None, help='Write all runs to this .csv or .jsonl file')
+def main(models, samples, trials, max_angle, max_translation, noise, iterations, backend, seed, report):
+    """Benchmark ICP on MODELS (default: Models/*.off and a generated blob)."""
+    models = models or sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'Models', '*.off'))) + ['blob']
+    factors = [float(s) for s in samples.split(',')]
+    rng = np.random.default_rng(seed)
+    np.random.seed(seed)  # ICP.subsample shuffles with the global generator
+
+    rows = []
+    print(f"{'model':<20} {'mode':<14} {'radius':>6} {'samples':>8} {'iters':>6} {'conv':>5} {'ms/iter':>8} "
+          f"{'rot err':>8} {'trans err':>10} {'rms err':>10}")
+    for model in models:
+        points, faces = load_model(model)
+        points = points - points.mean(axis=0)
+        mesh = om.TriMesh(points, faces)
+        mesh.request_vertex_normals()
+        mesh.request_face_normals()
+        mesh.update_normals()
+        edges = mesh.edge_vertex_indices()
+        average_vertex_distance = np.mean(np.linalg.norm(points[edges[:, 0]] - points[edges[:, 1]], axis=1))
+        diagonal = np.linalg.norm(points.max(axis=0) - points.min(axis=0))
+        name = os.path.splitext(os.path.basename(model))[0]
+
+        for factor in factors:
+            icp = ICP(points, mesh.vertex_normals(), average_vertex_distance, backend=backend,
+                      iterations=iterations, subsample_factor=factor, verbose=False, target_faces=faces)
+            for tangential_motion in (False, True):
+                mode = 'point2surface' if tangential_motion else 'point2point'
+                results = []
+                for trial in range(trials):
+                    gt = random_transformation(rng, max_angle, max_translation * diagonal)
+                    result = run_case(icp, points, tangential_motion, gt, noise * average_vertex_distance, rng)
+                    result.update(model=name, mode=mode, subsample_factor=factor, trial=trial,
+                                  vertices=len(points), backend=backend)
+                    results.append(result)
+                rows.extend(results)
+
+                mean = {key: np.mean([r[key] for r in results]) for key in
+                        ('samples', 'iterations', 'time_per_iteration', 'rotation_error', 'translation_error', 'rms_error')}
+                # Iterations only measure convergence speed for the converged trials
+                converged = sum(r['stop_reason'] == STOP_CONVERGED for r in results)
+                print(f"{name:<20} {mode:<14} {factor:>6g} {mean['samples']:>8.0f} {mean['iterations']:>6.1f} "
+                      f"{converged:>2}/{len(results):<2} "
+                      f"{mean['time_per_iteration'] * 1000:>8.2f} {mean['rotation_error']:>8.3f} "
+                      f"{mean['translation_error']:>10.2e} {mean['rms_error']:>10.2e}")
+
+    if report and rows:
+        write_report(report, rows)
+        print(f"Saved report to {report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho, Ekaterina Radionova
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy.spatial import KDTree
+
+
+def closest_points_on_triangles(p, a, b, c):
+    """
+    Closest points on triangles (a, b, c) to points p, all of shape (n, 3).
+    Returns the closest points and their barycentric coordinates (n, 3).
+    Follows the Voronoi region tests of Ericson, Real-Time Collision Detection, 5.1.5.
+    """
+    ab, ac, ap = b - a, c - a, p - a
+    d1 = np.einsum('ij,ij->i', ab, ap)
+    d2 = np.einsum('ij,ij->i', ac, ap)
+    bp = p - b
+    d3 = np.einsum('ij,ij->i', ab, bp)
+    d4 = np.einsum('ij,ij->i', ac, bp)
+    cp = p - c
+    d5 = np.einsum('ij,ij->i', ab, cp)
+    d6 = np.einsum('ij,ij->i', ac, cp)
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Interior: barycentric coordinates from the signed areas
+        denom = va + vb + vc
+        v = np.where(denom != 0, vb / denom, 1 / 3)
+        w = np.where(denom != 0, vc / denom, 1 / 3)
+        bary = np.stack([1 - v - w, v, w], axis=1)
+
+        def edge(mask, t, i, j):
+            t = np.clip(np.nan_to_num(t), 0, 1)[mask]
+            bary[mask] = 0
+            bary[mask, i] = 1 - t
+            bary[mask, j] = t
+
+        # Edge regions (checked before vertex regions, which take precedence)
+        edge_bc = (va <= 0) & ((d4 - d3) >= 0) & ((d5 - d6) >= 0)
+        edge(edge_bc, (d4 - d3) / ((d4 - d3) + (d5 - d6)), 1, 2)
+        edge_ac = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        edge(edge_ac, d2 / (d2 - d6), 0, 2)
+        edge_ab = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        edge(edge_ab, d1 / (d1 - d3), 0, 1)
+
+    # Vertex regions
+    for mask, i in (((d6 >= 0) & (d5 <= d6), 2), ((d3 >= 0) & (d4 <= d3), 1), ((d1 <= 0) & (d2 <= 0), 0)):
+        bary[mask] = 0
+        bary[mask, i] = 1
+
+    closest = bary[:, :1] * a + bary[:, 1:2] * b + bary[:, 2:] * c
+    return closest, bary
+
+
+class TriangleBVH:
+    """
+    Bounding volume hierarchy over the triangles of a mesh for exact
+    closest-surface-point queries. Queries are answered in batches: all
+    queries descend the tree together and subtrees farther away than the best
+    triangle found so far are pruned. Query batches are split over threads.
+    Surface points farther than max_distance from a query are not searched
+    for, and the query is reported as a miss.
+    """
+    def __init__(self, points, faces, vertex_normals=None, leaf_size=8, workers=None, chunk_size=8192,
+                 max_distance=np.inf):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.faces = np.asarray(faces, dtype=np.int64).reshape(-1, 3)
+        self.vertex_normals = None if vertex_normals is None else np.asarray(vertex_normals, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_distance = max_distance
+        self.corners = self.points[self.faces]  # (m, 3 vertices, 3)
+        self._build()
+        # Triangle centroids give a tight initial distance bound for every query
+        self.centroid_tree = KDTree(self.corners.mean(axis=1))
+
+    def _build(self):
+        tri_min = self.corners.min(axis=1)
+        tri_max = self.corners.max(axis=1)
+        centroids = self.corners.mean(axis=1)
+
+        order = np.arange(len(self.faces))
+        node_min, node_max, children, leaf_start, leaf_count = [], [], [], [], []
+        # (start, stop) ranges of `order` still to be turned into nodes, with their parent slot
+        stack = [(0, len(order), -1, 0)]
+        while stack:
+            start, stop, parent, side = stack.pop()
+            node = len(node_min)
+            if parent >= 0:
+                children[parent][side] = node
+            tris = order[start:stop]
+            node_min.append(tri_min[tris].min(axis=0))
+            node_max.append(tri_max[tris].max(axis=0))
+            children.append([-1, -1])
+            if stop - start <= self.leaf_size:
+                leaf_start.append(start)
+                leaf_count.append(stop - start)
+                continue
+            leaf_start.append(0)
+            leaf_count.append(0)
+            # Median split along the longest axis of the centroid bounds
+            c = centroids[tris]
+            axis = np.argmax(c.max(axis=0) - c.min(axis=0))
+            mid = (stop - start) // 2
+            order[start:stop] = tris[np.argpartition(c[:, axis], mid)]
+            stack.append((start + mid, stop, node, 1))
+            stack.append((start, start + mid, node, 0))
+
+        self.order = order
+        self.node_min = np.array(node_min)
+        self.node_max = np.array(node_max)
+        self.children = np.array(children, dtype=np.int64)
+        self.leaf_start = np.array(leaf_start, dtype=np.int64)
+        self.leaf_count = np.array(leaf_count, dtype=np.int64)
+
+    def query(self, queries):
+        """
+        Closest surface points to `queries` (n, 3).
+        Returns distances (n,), closest points (n, 3), interpolated unit normals
+        (n, 3; face normals if no vertex normals were given) and face indices (n,).
+        Misses have an infinite distance and face index -1.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        chunks = [queries[i:i + self.chunk_size] for i in range(0, len(queries), self.chunk_size)]
+        if len(chunks) > 1 and self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(self._query_chunk, chunks))
+        else:
+            results = [self._query_chunk(chunk) for chunk in chunks]
+        if not results:
+            return np.zeros(0), np.zeros((0, 3)), np.zeros((0, 3)), np.zeros(0, dtype=np.int64)
+
+        dists = np.concatenate([r[0] for r in results])
+        closest = np.concatenate([r[1] for r in results])
+        bary = np.concatenate([r[2] for r in results])
+        face_index = np.concatenate([r[3] for r in results])
+        return dists, closest, self._normals(face_index, bary), face_index
+
+    def _normals(self, face_index, bary):
+        if self.vertex_normals is not None:
+            normals = np.einsum('nk,nkj->nj', bary, self.vertex_normals[self.faces[face_index]])
+        else:
+            corners = self.corners[face_index]
+            normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+        normals[face_index < 0] = 0
+        lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+        return normals / np.where(lengths > 0, lengths, 1.0)
+
+    def _triangle_candidates(self, queries, q, tris, best_d2, best_point, best_bary, best_face):
+        corners = self.corners[tris]
+        closest, bary = closest_points_on_triangles(queries[q], corners[:, 0], corners[:, 1], corners[:, 2])
+        d2 = np.sum((closest - queries[q]) ** 2, axis=1)
+        # Keep the nearest candidate per query
+        by_query = np.lexsort((d2, q))
+        q, d2, closest, bary, tris = q[by_query], d2[by_query], closest[by_query], bary[by_query], tris[by_query]
+        head = np.r_[True, q[1:] != q[:-1]]
+        q, d2, closest, bary, tris = q[head], d2[head], closest[head], bary[head], tris[head]
+        better = d2 < best_d2[q]
+        q = q[better]
+        best_d2[q] = d2[better]
+        best_point[q] = closest[better]
+        best_bary[q] = bary[better]
+        best_face[q] = tris[better]
+
+    def _query_chunk(self, queries):
+        n = len(queries)
+        best_d2 = np.full(n, float(self.max_distance) ** 2)
+        best_point = np.zeros((n, 3))
+        best_bary = np.zeros((n, 3))
+        best_face = np.full(n, -1, dtype=np.int64)
+
+        # Initial bound from the triangle with the nearest centroid
+        _, nearest = self.centroid_tree.query(queries)
+        self._triangle_candidates(queries, np.arange(n), nearest, best_d2, best_point, best_bary, best_face)
+
+        # Breadth-first descent of all (query, node) pairs
+        q = np.arange(n)
+        nodes = np.zeros(n, dtype=np.int64)
+        while len(q):
+            # Squared distance from each query to the node's bounding box
+            gap = np.maximum(self.node_min[nodes] - queries[q], 0) + np.maximum(queries[q] - self.node_max[nodes], 0)
+            close = np.sum(gap ** 2, axis=1) < best_d2[q]
+            q, nodes = q[close], nodes[close]
+
+            leaf = self.children[nodes, 0] < 0
+            if np.any(leaf):
+                lq, ln = q[leaf], nodes[leaf]
+                counts = self.leaf_count[ln]
+                first = np.repeat(self.leaf_start[ln] - np.cumsum(counts) + counts, counts)
+                tris = self.order[first + np.arange(counts.sum())]
+                self._triangle_candidates(queries, np.repeat(lq, counts), tris,
+                                          best_d2, best_point, best_bary, best_face)
+
+            q, nodes = q[~leaf], nodes[~leaf]
+            q = np.repeat(q, 2)
+            nodes = self.children[nodes].ravel()
+
+        dists = np.where(best_face >= 0, np.sqrt(best_d2), np.inf)
+        return dists, best_point, best_bary, best_face
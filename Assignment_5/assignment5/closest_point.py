@@ -31,14 +31,201 @@
 
 from scipy.spatial import KDTree
 import numpy as np
+from bvh import TriangleBVH
 
-class ClosestPoint:
-    def __init__(self):
+
+class PointBackend:
+    """
+    Base of the backends that match queries to the nearest target point.
+    Subclasses build their search structure in build_index(pts) and return
+    (distances, indices) from query(queries), with misses as index -1.
+    """
+    # Matches are target points, which lie on the target's side of the normal
+    two_sided = False
+
+    def build(self, pts, normals=None, faces=None):
+        self.pts = np.asarray(pts, dtype=np.float64)
+        self.normals = None if normals is None else np.asarray(normals, dtype=np.float64)
+        self.build_index(self.pts)
+
+    def closest(self, queries):
+        dists, idx = self.query(queries)
+        found = idx >= 0
+        closest = np.zeros((len(idx), 3))
+        closest[found] = self.pts[idx[found]]
+        normals = np.zeros((len(idx), 3))
+        if self.normals is not None:
+            normals[found] = self.normals[idx[found]]
+        return np.where(found, dists, np.inf), closest, normals
+
+
+class KDTreeBackend(PointBackend):
+    """
+    KD-tree search over all cores.
+    eps > 0 allows approximate neighbors within a factor (1 + eps) of the true
+    distance; matches farther than max_distance are reported as misses.
+    """
+    def __init__(self, eps=0.0, max_distance=np.inf, workers=-1):
+        self.eps = eps
+        self.max_distance = max_distance
+        self.workers = workers
         self.kdtree = None
 
-    def init(self, pts):
+    def build_index(self, pts):
         self.kdtree = KDTree(pts)
 
+    def query(self, queries):
+        dists, idx = self.kdtree.query(queries, eps=self.eps,
+                                       distance_upper_bound=self.max_distance, workers=self.workers)
+        miss = idx == self.kdtree.n
+        idx[miss] = -1
+        return dists, idx
+
+
+class ApproximateKDTreeBackend(KDTreeBackend):
+    """KD-tree with approximate search and a bounded search radius."""
+    def __init__(self, eps=0.5, max_distance=np.inf, workers=-1):
+        super().__init__(eps, max_distance, workers)
+
+
+class GridBackend(PointBackend):
+    """
+    Uniform grid hash for roughly uniformly sampled scans.
+    Only the 27 cells around a query are searched, so the result is exact for
+    neighbors closer than cell_size and a miss otherwise.
+    """
+    OFFSETS = np.array([[i, j, k] for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)])
+
+    def __init__(self, cell_size=None, chunk_size=4096):
+        self.cell_size = cell_size
+        self.chunk_size = chunk_size
+
+    def build_index(self, pts):
+        self.origin = pts.min(axis=0)
+        if self.cell_size is None:
+            # Roughly one point per cell for points spread over the bounding box
+            extent = np.maximum(pts.max(axis=0) - self.origin, 1e-12)
+            self.cell_size = float(np.cbrt(np.prod(extent) / len(pts)))
+        cells = np.floor((pts - self.origin) / self.cell_size).astype(np.int64)
+        self.dims = cells.max(axis=0) + 1
+        keys = self._keys(cells)
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def _keys(self, cells):
+        # Cells outside the grid are clamped to an empty border layer
+        c = np.clip(cells, -1, self.dims) + 1
+        size = self.dims + 2
+        return (c[:, 0] * size[1] + c[:, 1]) * size[2] + c[:, 2]
+
+    def query(self, queries):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        dists = np.full(len(queries), np.inf)
+        idx = np.full(len(queries), -1, dtype=np.int64)
+        for start in range(0, len(queries), self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            dists[chunk], idx[chunk] = self._query_chunk(queries[chunk])
+        miss = dists > self.cell_size
+        dists[miss] = np.inf
+        idx[miss] = -1
+        return dists, idx
+
+    def _query_chunk(self, queries):
+        n = len(queries)
+        best_d = np.full(n, np.inf)
+        best_i = np.full(n, -1, dtype=np.int64)
+        cells = np.floor((queries - self.origin) / self.cell_size).astype(np.int64)
+        for offset in self.OFFSETS:
+            keys = self._keys(cells + offset)
+            lo = np.searchsorted(self.sorted_keys, keys, side='left')
+            counts = np.searchsorted(self.sorted_keys, keys, side='right') - lo
+            total = counts.sum()
+            if total == 0:
+                continue
+            # Expand every (query, cell) pair into one row per candidate point
+            q = np.repeat(np.arange(n), counts)
+            first = np.repeat(lo - np.cumsum(counts) + counts, counts)
+            cand = self.order[first + np.arange(total)]
+            d = np.linalg.norm(queries[q] - self.pts[cand], axis=1)
+
+            # Nearest candidate per query
+            by_query = np.lexsort((d, q))
+            q, d, cand = q[by_query], d[by_query], cand[by_query]
+            head = np.r_[True, q[1:] != q[:-1]]
+            q, d, cand = q[head], d[head], cand[head]
+            better = d < best_d[q]
+            best_d[q[better]] = d[better]
+            best_i[q[better]] = cand[better]
+        return best_d, best_i
+
+
+class BVHBackend:
+    """
+    Closest points on the target triangles, with normals interpolated from the
+    target vertex normals, found through a TriangleBVH. Matches farther than
+    max_distance are reported as misses.
+    """
+    # Matches lie on the surface, so sources may sit on either side of it
+    two_sided = True
+
+    def __init__(self, max_distance=np.inf, leaf_size=8, workers=None):
+        self.max_distance = max_distance
+        self.leaf_size = leaf_size
+        self.workers = workers
+        self.bvh = None
+
+    def build(self, pts, normals=None, faces=None):
+        if faces is None:
+            raise ValueError("The 'bvh' backend needs the target faces")
+        self.bvh = TriangleBVH(pts, faces, normals, leaf_size=self.leaf_size, workers=self.workers,
+                               max_distance=self.max_distance)
+
+    def query(self, queries):
+        dists, _, _, face_index = self.bvh.query(queries)
+        return dists, face_index
+
+    def closest(self, queries):
+        dists, closest, normals, _ = self.bvh.query(queries)
+        return dists, closest, normals
+
+
+BACKENDS = {
+    'kdtree': KDTreeBackend,
+    'approx': ApproximateKDTreeBackend,
+    'grid': GridBackend,
+    'bvh': BVHBackend,
+}
+
+
+class ClosestPoint:
+    def __init__(self, backend='kdtree', **options):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown closest point backend '{backend}', expected one of {list(BACKENDS)}")
+        self.backend = BACKENDS[backend](**options)
+
+    @property
+    def two_sided(self):
+        """Whether matches may lie on either side of their normal."""
+        return self.backend.two_sided
+
+    def init(self, pts, normals=None, faces=None):
+        """Build the search structure over the target points (normals and faces are optional)."""
+        self.backend.build(pts, normals, faces)
+
     def get_closest_point(self, query):
-        dist, idx = self.kdtree.query(query)
-        return idx
\ No newline at end of file
+        dists, idx = self.backend.query(np.atleast_2d(query))
+        return idx[0]
+
+    def get_closest_points(self, queries):
+        """
+        Return distances and indices of the closest points (of the closest
+        triangles for 'bvh'); misses have index -1.
+        """
+        return self.backend.query(queries)
+
+    def get_closest_surface_points(self, queries):
+        """
+        Return distances (n,), closest points (n, 3) and their unit normals (n, 3)
+        on the target; misses have an infinite distance.
+        """
+        return self.backend.closest(np.atleast_2d(queries))
@@ -0,0 +1,229 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho, Ekaterina Radionova
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import itertools
+import math
+import numpy as np
+from closest_point import ClosestPoint
+from registration import Registration
+from telemetry import IcpTelemetry
+
+NEIGHBOR_OFFSETS = list(itertools.product((-1, 0, 1), repeat=3))
+
+# Why ICP.run stopped
+STOP_CONVERGED = 'converged'
+STOP_MAX_ITERATIONS = 'max_iterations'
+STOP_NO_CORRESPONDENCES = 'no_correspondences'
+STOP_CANCELLED = 'cancelled'
+
+
+class ICP:
+    """
+    Iterative closest point alignment of source scans to a fixed target.
+    Holds the target points, normals and their nearest-neighbor search
+    structure; does not depend on OpenGL, so it can run without a window.
+    """
+    def __init__(self, target, target_normals, average_vertex_distance, backend='kdtree', radius=0.0,
+                 iterations=20, tolerance=1e-3, subsample_factor=8, verbose=True, target_faces=None):
+        self.target = np.asarray(target, dtype=np.float64)
+        self.target_normals = np.asarray(target_normals, dtype=np.float64)
+        self.average_vertex_distance = average_vertex_distance
+        self.iterations = iterations
+        self.tolerance = tolerance
+        self.subsample_factor = subsample_factor
+        self.verbose = verbose
+        self.registration = Registration()
+
+        # 'approx' and 'grid' search within radius, by default 8 times the average edge length;
+        # 'bvh' (closest points on the target triangles) only drops matches beyond a given radius
+        search_radius = radius or average_vertex_distance * 8
+        options = {'approx': {'max_distance': search_radius}, 'grid': {'cell_size': search_radius},
+                   'bvh': {'max_distance': radius or np.inf}}
+        self.closest_point = ClosestPoint(backend, **options.get(backend, {}))
+        self.closest_point.init(self.target, self.target_normals, target_faces)
+
+    def run(self, src_pts, transformation, tangential_motion, telemetry=None, publish=None, cancelled=None):
+        """
+        Run up to `iterations` ICP steps on the source points, starting from `transformation`.
+        After every step publish(transformation, sampled points) is called; the run
+        stops early once the increment falls below `tolerance` or `cancelled` is set.
+        Timings and convergence metrics of every step go to `telemetry`.
+        Returns the final transformation, the number of steps taken and why the
+        run stopped (one of the STOP_* constants).
+        """
+        if telemetry is None:
+            telemetry = IcpTelemetry()
+        src_pts = np.asarray(src_pts, dtype=np.float64)
+
+        for iteration in range(self.iterations):
+            if cancelled is not None and cancelled.is_set():
+                return transformation, iteration, STOP_CANCELLED
+            telemetry.begin_iteration(iteration)
+            with telemetry.stage("subsample"):
+                sampled_points = self.subsample(src_pts)
+            telemetry.record(samples=len(sampled_points))
+            with telemetry.stage("transform"):
+                src = transformation.transform_points(src_pts[sampled_points])
+
+            src_f, target_f, target_n_f = [], [], []
+            self.calculate_correspondences(src, self.target, self.target_normals, self.closest_point,
+                                           src_f, target_f, target_n_f, telemetry)
+            if not src_f:
+                telemetry.end_iteration()
+                if self.verbose:
+                    print("Registration stopped: no correspondences")
+                return transformation, iteration, STOP_NO_CORRESPONDENCES
+
+            with telemetry.stage("solve"):
+                tr = (self.registration.register_point2surface(src_f, target_f, target_n_f) if tangential_motion
+                      else self.registration.register_point2point(src_f, target_f))
+            with telemetry.stage("apply"):
+                transformation = tr * transformation
+                if publish is not None:
+                    publish(transformation, sampled_points)
+
+            residual = np.asarray(src_f) - np.asarray(target_f)
+            telemetry.record(
+                rms_error=float(np.sqrt(np.mean(np.sum(residual ** 2, axis=1)))),
+                rms_plane_error=float(np.sqrt(np.mean(np.einsum('ij,ij->i', residual, np.asarray(target_n_f)) ** 2))),
+                rotation_increment=float(tr.angle()),
+                translation_increment=float(np.linalg.norm(tr.translation)),
+            )
+            telemetry.end_iteration()
+
+            if (tr.angle() < self.tolerance and
+                    np.linalg.norm(tr.translation) < self.tolerance * self.average_vertex_distance):
+                if self.verbose:
+                    print(f"Registration converged after {iteration + 1} iterations")
+                return transformation, iteration + 1, STOP_CONVERGED
+
+        if self.verbose:
+            print(f"Registration stopped after {self.iterations} iterations without converging")
+        return transformation, self.iterations, STOP_MAX_ITERATIONS
+
+    def subsample(self, pts):
+        """
+        Task 1: Sample points uniformly on the source mesh.
+        Goal: Average distance between sampled points should be ~subsample_radius.
+        """
+        subsample_radius = self.average_vertex_distance * self.subsample_factor  # e.g. 8 times average edge length
+        sampled = []
+        indices = list(range(len(pts)))
+        
+        # Shuffle indices randomly
+        np.random.shuffle(indices)
+
+        # Accepted samples are hashed into cells of size subsample_radius, so a
+        # candidate only has to be checked against samples in the 27 cells around it.
+        cells = {}
+        points = np.asarray(pts, dtype=np.float64).tolist()
+        keys = [tuple(c) for c in np.floor(np.asarray(pts) / subsample_radius).astype(np.int64).tolist()]
+        
+        for idx in indices:
+            p = points[idx]
+            cx, cy, cz = keys[idx]
+            # Check distance to every already sampled point nearby.
+            keep = True
+            for dx, dy, dz in NEIGHBOR_OFFSETS:
+                for s_idx in cells.get((cx + dx, cy + dy, cz + dz), ()):
+                    if math.dist(p, points[s_idx]) < subsample_radius:
+                        keep = False
+                        break
+                if not keep:
+                    break
+            if keep:
+                sampled.append(idx)
+                cells.setdefault(keys[idx], []).append(idx)
+        
+        return sampled
+
+
+    def calculate_correspondences(self, src, target, target_normals, cp, src_f, target_f, target_n_f, telemetry=None):
+        """
+        Task 2: Find closest points and reject bad pairs.
+        - For all source points in src, use cp.get_closest_surface_points(src) to find their closest target points
+        and the normals there.
+        - Compute the distances manually.
+        - Reject pairs where the distance is greater than 3 times the median distance.
+        - Compute the unit vector from the target point to the source point and ensure its dot product with the target normal
+        is above 0.5 (i.e. angle < 60°).
+        - Update the filtered lists: src_f, target_f, and target_n_f.
+        """
+        if telemetry is None:
+            telemetry = IcpTelemetry()
+        src = np.asarray(src, dtype=np.float64).reshape(-1, 3)
+
+        # For each source point, find its closest target point and the normal there.
+        # Backends with a bounded search radius report misses at infinite distance.
+        with telemetry.stage("nearest_neighbor"):
+            closest_dists, closest_pts, closest_normals = cp.get_closest_surface_points(src)
+            found = np.isfinite(closest_dists)
+            target_candidate_pts = closest_pts[found]
+            target_candidate_normals = closest_normals[found]
+        src_candidate_pts = src[found]
+        candidate_distances = np.linalg.norm(src_candidate_pts - target_candidate_pts, axis=1)
+
+        if self.verbose:
+            print("calculate_correspondences: candidate num:", len(src_candidate_pts))
+        telemetry.record(candidates=len(src_candidate_pts), correspondences=0, rejection_ratio=1.0)
+        
+        if len(candidate_distances) == 0:
+            return
+
+        with telemetry.stage("rejection"):
+            # Compute the median distance and set the distance threshold (3x median)
+            median_distance = np.median(candidate_distances)
+            dist_threshold = 3 * median_distance
+
+            # Normal compatibility: require dot product > cos(60°) = 0.5
+            normal_threshold = 0.5
+
+            # Unit vectors from the target points to the source points;
+            # coincident pairs have no direction and are rejected.
+            vec = src_candidate_pts - target_candidate_pts
+            nonzero = candidate_distances > 0
+            dot_val = np.einsum('ij,ij->i', vec, target_candidate_normals) / np.where(nonzero, candidate_distances, 1.0)
+            if cp.two_sided:
+                # Closest surface points are offset along the normal on either side
+                # of the surface, so only the angle matters; offsets that leave
+                # through a border edge are still rejected. Points on the surface match.
+                dot_val = np.where(nonzero, np.abs(dot_val), 1.0)
+                nonzero = np.ones_like(nonzero)
+
+            # Prune candidate correspondences based on distance and normal compatibility.
+            keep = (candidate_distances <= dist_threshold) & nonzero & (dot_val >= normal_threshold)
+
+            src_f.extend(src_candidate_pts[keep])
+            target_f.extend(target_candidate_pts[keep])
+            target_n_f.extend(target_candidate_normals[keep])
+
+        n_kept = int(np.count_nonzero(keep))
+        telemetry.record(correspondences=n_kept, rejection_ratio=1.0 - n_kept / len(keep))
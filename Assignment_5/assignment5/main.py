@@ -38,9 +38,15 @@ import glfw
 @click.command()
 @click.option('--output_file', type=str, default="output.obj", required=True, help='Path to the output file')
 @click.argument('mesh_files', nargs=-1, type=click.Path(exists=True), required=True)
+@click.option('--voxel_size', type=float, default=0.0, help='Merge saved points per voxel of this size (0 disables merging)')
+@click.option('--nn_backend', type=click.Choice(['kdtree', 'approx', 'grid', 'bvh']), default='kdtree',
+              help='Nearest-neighbor backend for correspondences')
+@click.option('--nn_radius', type=float, default=0.0,
+              help='Search radius of the approx/grid/bvh backends (0 uses 8x the average edge length; unbounded for bvh)')
+@click.option('--metrics_file', type=str, default=None, help='Append per-iteration ICP metrics to this JSON lines file')
 @click.option('--window_width', type=int, default=800, help='Window width')
 @click.option('--window_height', type=int, default=800, help='Window height')
-def main(output_file, mesh_files, window_width, window_height):
+def main(output_file, mesh_files, voxel_size, nn_backend, nn_radius, metrics_file, window_width, window_height):
     if not glfw.init():
         raise RuntimeError("Failed to initialize GLFW")
 
@@ -51,7 +57,9 @@ def main(output_file, mesh_files, window_width, window_height):
     glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, True)  # For macOS compatibility
 
     viewer = RegistrationViewerApp("Registration Viewer", window_width, window_height)
-    viewer.set_output(output_file)
+    viewer.set_output(output_file, voxel_size)
+    viewer.set_closest_point_backend(nn_backend, nn_radius)
+    viewer.set_metrics_output(metrics_file)
     viewer.open_meshes(mesh_files)
     viewer.run()
 
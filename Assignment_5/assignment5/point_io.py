@@ -0,0 +1,154 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho, Ekaterina Radionova
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import itertools
+import os
+import numpy as np
+import openmesh as om
+
+CHUNK_SIZE = 1 << 16
+TEXT_FORMAT = "v {:.4f} {:.4f} {:.4f} vn {:.6f} {:.6f} {:.6f}\n"
+PLY_DTYPE = np.dtype([(name, '<f4') for name in ('x', 'y', 'z', 'nx', 'ny', 'nz')])
+PLY_CONFIDENCE_DTYPE = np.dtype(PLY_DTYPE.descr + [('confidence', '<f4')])
+
+
+def read_mesh_arrays(filename):
+    """
+    Read a triangle mesh and return its vertex positions (n, 3) and
+    triangle indices (m, 3) as arrays. Runs in worker processes, so only
+    plain arrays are returned.
+    """
+    mesh = om.read_trimesh(filename)
+    if mesh.n_vertices() == 0:
+        raise RuntimeError(f"Could not read mesh from file: {filename}")
+    return mesh.points(), mesh.face_vertex_indices()
+
+
+def voxel_merge(points, normals, voxel_size):
+    """
+    Merge all points that fall into the same cell of a grid with spacing
+    `voxel_size`. Returns the mean position, the renormalized mean normal
+    and the number of merged points (as confidence) of every occupied cell.
+    """
+    if len(points) == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3)), np.zeros(0, dtype=np.int64)
+    cells = np.floor(points / voxel_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    dims = cells.max(axis=0) + 1
+    keys = (cells[:, 0] * dims[1] + cells[:, 1]) * dims[2] + cells[:, 2]
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+
+    merged_points = np.stack([np.bincount(inverse, weights=points[:, k]) for k in range(3)], axis=1)
+    merged_points /= counts[:, None]
+    merged_normals = np.stack([np.bincount(inverse, weights=normals[:, k]) for k in range(3)], axis=1)
+    lengths = np.linalg.norm(merged_normals, axis=1, keepdims=True)
+    merged_normals /= np.where(lengths > 0, lengths, 1.0)
+    return merged_points, merged_normals, counts
+
+
+def save_points(filename, scans, n_points, voxel_size=0.0):
+    """
+    Write registered points and normals to `filename`.
+    The format is chosen from the extension: `.ply` gives a binary PLY,
+    `.npz` a NumPy archive with `points` and `normals`, anything else the
+    `v x y z vn nx ny nz` text format.
+    `scans` yields (points, normals) array pairs, `n_points` is their total length.
+    With a positive `voxel_size` the scans are merged by `voxel_merge` first;
+    PLY and NPZ outputs then also store the per-point `confidence` counts.
+    """
+    if voxel_size > 0:
+        # An empty scan list merges into an empty point set
+        points, normals = list(zip(*scans)) or ([np.zeros((0, 3))], [np.zeros((0, 3))])
+        merged = voxel_merge(np.concatenate(points), np.concatenate(normals), voxel_size)
+        print(f"Voxel merge: {n_points} -> {len(merged[0])} points")
+        scans, n_points = [merged], len(merged[0])
+
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == '.ply':
+        write_ply(filename, scans, n_points)
+    elif ext == '.npz':
+        write_npz(filename, scans)
+    else:
+        write_text(filename, scans)
+
+
+def write_text(filename, scans, chunk_size=CHUNK_SIZE):
+    with open(filename, 'w') as f:
+        for points, normals, *_ in scans:
+            data = np.hstack([points, normals])
+            for start in range(0, len(data), chunk_size):
+                chunk = data[start:start + chunk_size]
+                # One format call per chunk instead of one per point
+                f.write((TEXT_FORMAT * len(chunk)).format(*chunk.ravel().tolist()))
+
+
+def write_ply(filename, scans, n_points, chunk_size=CHUNK_SIZE):
+    scans = iter(scans)
+    first = next(scans, None)
+    if first is None:
+        first = (np.zeros((0, 3)), np.zeros((0, 3)))
+    dtype = PLY_CONFIDENCE_DTYPE if len(first) > 2 else PLY_DTYPE
+    header = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        f"element vertex {n_points}\n"
+        + "".join(f"property float {name}\n" for name in dtype.names)
+        + "end_header\n"
+    )
+    written = 0
+    with open(filename, 'wb') as f:
+        f.write(header.encode('ascii'))
+        for points, normals, *counts in itertools.chain([first], scans):
+            for start in range(0, len(points), chunk_size):
+                p = points[start:start + chunk_size]
+                n = normals[start:start + chunk_size]
+                chunk = np.empty(len(p), dtype=dtype)
+                chunk['x'], chunk['y'], chunk['z'] = p.T
+                chunk['nx'], chunk['ny'], chunk['nz'] = n.T
+                if counts:
+                    chunk['confidence'] = counts[0][start:start + chunk_size]
+                f.write(chunk.tobytes())
+                written += len(chunk)
+    if written != n_points:
+        raise RuntimeError(f"PLY header announced {n_points} points but {written} were written")
+
+
+def write_npz(filename, scans):
+    points, normals, counts = [np.zeros((0, 3), dtype=np.float32)], [np.zeros((0, 3), dtype=np.float32)], []
+    for p, n, *c in scans:
+        points.append(np.asarray(p, dtype=np.float32))
+        normals.append(np.asarray(n, dtype=np.float32))
+        counts.extend(c)
+    arrays = dict(points=np.concatenate(points), normals=np.concatenate(normals))
+    if counts:
+        arrays['confidence'] = np.concatenate(counts).astype(np.float32)
+    np.savez(filename, **arrays)
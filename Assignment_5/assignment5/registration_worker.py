@@ -0,0 +1,84 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho, Ekaterina Radionova
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import queue
+import threading
+
+
+class RegistrationWorker:
+    """
+    Runs one registration job at a time on a background thread.
+    Jobs publish intermediate results, which the render loop collects with
+    poll(). Submitting a new job cancels the running one, and results of
+    cancelled jobs are dropped.
+    """
+    def __init__(self):
+        self.updates = queue.Queue()
+        self.generation = 0
+        self.cancel_event = threading.Event()
+        self.thread = None
+
+    def submit(self, job, *args):
+        """Start job(*args, publish, cancelled) after cancelling the running job."""
+        self.cancel()
+        generation = self.generation
+        cancelled = self.cancel_event
+
+        def publish(update):
+            self.updates.put((generation, update))
+
+        def run():
+            try:
+                job(*args, publish, cancelled)
+            except Exception as e:
+                print("Registration error:", e)
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.cancel_event = threading.Event()
+        self.generation += 1
+
+    def busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def poll(self):
+        """Return the updates published by the current job since the last call."""
+        updates = []
+        while True:
+            try:
+                generation, update = self.updates.get_nowait()
+            except queue.Empty:
+                return updates
+            if generation == self.generation:
+                updates.append(update)
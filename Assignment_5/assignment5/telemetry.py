@@ -0,0 +1,83 @@
+'''
+                                                
+   Code framework for the lecture
+
+   "CV804: 3D Geometry Processing"
+
+   Lecturer: Hao Li
+   TAs: Phong Tran, Long Nhat Ho, Ekaterina Radionova
+
+   Copyright (C) 2025 by  Metaverse Lab, MBZUAI
+                                                                         
+-----------------------------------------------------------------------------
+                                                                            
+                                License                                     
+                                                                            
+   This program is free software; you can redistribute it and/or
+   modify it under the terms of the GNU General Public License
+   as published by the Free Software Foundation; either version 2
+   of the License, or (at your option) any later version.
+   
+   This program is distributed in the hope that it will be useful,
+   but WITHOUT ANY WARRANTY; without even the implied warranty of
+   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+   GNU General Public License for more details.
+   
+   You should have received a copy of the GNU General Public License
+   along with this program; if not, write to the Free Software
+   Foundation, Inc., 51 Franklin Street, Fifth Floor, 
+   Boston, MA  02110-1301, USA.
+'''
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class IcpTelemetry:
+    """
+    Per-iteration timings and convergence metrics of an ICP run.
+    Every iteration is one record (a dict) holding `<stage>_time` entries in
+    seconds plus any values passed to record(). Finished records are appended
+    to `filename` as JSON lines when a filename is given.
+    """
+    STAGES = ("subsample", "transform", "nearest_neighbor", "rejection", "solve", "apply")
+
+    _file_lock = threading.Lock()
+
+    def __init__(self, filename=None, **fields):
+        self.filename = filename
+        self.fields = fields
+        self.records = []
+        self.current = {}
+
+    def begin_iteration(self, iteration):
+        self.current = dict(self.fields, iteration=iteration)
+        self.current.update((f"{stage}_time", 0.0) for stage in self.STAGES)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            key = f"{name}_time"
+            self.current[key] = self.current.get(key, 0.0) + time.perf_counter() - start
+
+    def record(self, **values):
+        self.current.update(values)
+
+    def end_iteration(self):
+        record = self.current
+        record["total_time"] = sum(record.get(f"{stage}_time", 0.0) for stage in self.STAGES)
+        self.records.append(record)
+        self.current = {}
+        if self.filename:
+            with self._file_lock, open(self.filename, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        return record
+
+    def summary(self):
+        """Total time per stage over all finished iterations."""
+        return {stage: sum(r.get(f"{stage}_time", 0.0) for r in self.records) for stage in self.STAGES}
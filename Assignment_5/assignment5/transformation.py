@@ -82,8 +82,79 @@ class Transformation:
         result.translation = self.rotation @ other.translation + self.translation
         return result
 
+    def angle(self):
+        """Rotation angle in degrees."""
+        return np.degrees(np.arccos(np.clip((np.trace(self.rotation) - 1) / 2, -1.0, 1.0)))
+
     def inverse(self):
         result = Transformation()
         result.rotation = self.rotation.T
         result.translation = -self.rotation.T @ self.translation
-        return result
\ No newline at end of file
+        return result
+
+
+class TransformationStack:
+    """
+    K rigid transformations stored as rotations (K, 3, 3) and translations (K, 3).
+    Composition, inversion and point transformation work on all poses at once.
+    """
+    CHUNK_SIZE = 1 << 20
+
+    def __init__(self, rotations, translations):
+        self.rotations = np.asarray(rotations, dtype=np.float64).reshape(-1, 3, 3)
+        self.translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+
+    @classmethod
+    def from_transformations(cls, transformations):
+        return cls([tr.rotation for tr in transformations], [tr.translation for tr in transformations])
+
+    @classmethod
+    def identity(cls, k):
+        return cls(np.tile(np.eye(3), (k, 1, 1)), np.zeros((k, 3)))
+
+    def __len__(self):
+        return len(self.rotations)
+
+    def __getitem__(self, index):
+        tr = Transformation()
+        tr.rotation = self.rotations[index].copy()
+        tr.translation = self.translations[index].copy()
+        return tr
+
+    def to_matrices(self):
+        mats = np.tile(np.eye(4), (len(self), 1, 1))
+        mats[:, :3, :3] = self.rotations
+        mats[:, :3, 3] = self.translations
+        return mats
+
+    def __mul__(self, other):
+        # Pairwise composition; either side may also hold a single pose
+        rotations = self.rotations @ other.rotations
+        translations = (self.rotations @ other.translations[..., None])[..., 0] + self.translations
+        return TransformationStack(rotations, translations)
+
+    def inverse(self):
+        rotations = self.rotations.transpose(0, 2, 1)
+        translations = -(rotations @ self.translations[..., None])[..., 0]
+        return TransformationStack(rotations, translations)
+
+    def transform_points(self, ps, pose_indices):
+        """Transform each point ps[n] by pose pose_indices[n]."""
+        return self._apply(ps, pose_indices, True)
+
+    def rotate_vectors(self, vs, pose_indices):
+        """Rotate each vector (e.g. a normal) vs[n] by pose pose_indices[n]."""
+        return self._apply(vs, pose_indices, False)
+
+    def _apply(self, ps, pose_indices, translate):
+        ps = np.asarray(ps, dtype=np.float64).reshape(-1, 3)
+        pose_indices = np.asarray(pose_indices)
+        result = np.empty_like(ps)
+        # Chunks bound the size of the gathered (n, 3, 3) rotations
+        for start in range(0, len(ps), self.CHUNK_SIZE):
+            chunk = slice(start, start + self.CHUNK_SIZE)
+            idx = pose_indices[chunk]
+            result[chunk] = np.einsum('nij,nj->ni', self.rotations[idx], ps[chunk])
+            if translate:
+                result[chunk] += self.translations[idx]
+        return result
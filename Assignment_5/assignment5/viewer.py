@@ -68,11 +68,19 @@ class Viewer:
 
     def run(self):
         while not glfw.window_should_close(self.window):
+            self.idle()
             self.display()
             glfw.swap_buffers(self.window)
             glfw.poll_events()
+        self.cleanup()
         glfw.terminate()
 
+    def idle(self):
+        pass
+
+    def cleanup(self):
+        pass
+
     def reshape(self, window, width, height):
         self.width, self.height = width, height
         glViewport(0, 0, width, height)
@@ -110,13 +110,21 @@ def main(input_path: str, mesh_save_path: str, mode: str, show_input_only: bool)
     assert osp.isfile(input_path), 'The input file does not exist'
 
     # Load points and normals
-    points = []
-    normals = []
-    with open(input_path, 'r') as f:
-        for line in f.readlines():
-            x, y, z, _, n1, n2, n3 = line.strip().split(' ')  # There are two spaces between points and normals
-            points.append((x, y, z))
-            normals.append((n1, n2, n3))
+    ext = osp.splitext(input_path)[1].lower()
+    if ext == '.npz':  # Binary export of the Assignment 5 registration viewer
+        with np.load(input_path) as data:
+            points, normals = data['points'], data['normals']
+    elif ext == '.ply':
+        pcd = o3d.io.read_point_cloud(input_path)
+        points, normals = np.asarray(pcd.points), np.asarray(pcd.normals)
+    else:
+        points = []
+        normals = []
+        with open(input_path, 'r') as f:
+            for line in f.readlines():
+                x, y, z, _, n1, n2, n3 = line.strip().split(' ')  # There are two spaces between points and normals
+                points.append((x, y, z))
+                normals.append((n1, n2, n3))
 
     points = np.array(points, dtype=np.float32)
     normals = np.array(normals, dtype=np.float32)